@@ -0,0 +1,61 @@
+
+import json
+from typing import Any, Optional, Union
+
+# JSON for the package: orjson when installed, stdlib json (ensure_ascii=False,
+# compact separators) otherwise or for inputs only stdlib handles.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+def _std_dumps(obj: Any, indent: Optional[int] = None) -> str:
+    if indent is None:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+    return json.dumps(obj, ensure_ascii=False, indent=indent)
+
+def _std_loads(s: Union[str, bytes]) -> Any:
+    return json.loads(s)
+
+if orjson is not None:
+    _OR_ERRORS = (TypeError, orjson.JSONEncodeError)
+
+    def dumps(obj: Any, indent: Optional[int] = None) -> str:
+        if indent is None or indent == 2:
+            try:
+                return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode("utf-8")
+            except _OR_ERRORS:
+                pass
+        return _std_dumps(obj, indent)
+
+    def _stdlib_may_accept(s: Union[str, bytes], e: Exception) -> bool:
+        # Re-parsing every failure with stdlib would double the cost of malformed model
+        # output on the repair path; only inputs stdlib can read get a second try.
+        if "surrogates" in str(e):
+            return True
+        if isinstance(s, str):
+            return "NaN" in s or "Infinity" in s
+        return b"NaN" in s or b"Infinity" in s
+
+    def loads(s: Union[str, bytes]) -> Any:
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch
+        # the same exception with either backend.
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError as e:
+            if _stdlib_may_accept(s, e):
+                return json.loads(s)
+            raise
+else:
+    dumps = _std_dumps
+    loads = _std_loads
+
+def dumps_canonical(obj: Any) -> str:
+    # Sorted, compact stdlib encoding for persisted hashes (content_hash, cache
+    # keys). Always stdlib: float formatting differs between backends for some
+    # values, and these digests must not change with the installed packages.
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+JSONDecodeError = json.JSONDecodeError
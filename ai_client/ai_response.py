@@ -10,3 +10,6 @@ class AIResponse:
     latency_ms: int
     tokens_in: int
     tokens_out: int
+    tokens_cached: int = 0
+    cached: bool = False
+    coalesced: bool = False
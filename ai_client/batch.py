@@ -0,0 +1,141 @@
+
+import asyncio, threading, time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Optional, Iterable, Iterator, AsyncIterator, Callable, Awaitable, Dict
+from .ai_request import AIRequest
+from .ai_response import AIResponse
+from .tokens import count_prompt_tokens, completion_budget
+
+@dataclass
+class BatchResult:
+    index: int
+    request: AIRequest
+    response: Optional[AIResponse] = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+def estimate_request_tokens(req: AIRequest) -> int:
+    # Pre-flight reservation: prompt tokens plus the completion budget.
+    max_tokens = req.max_tokens if req.max_tokens is not None else completion_budget(req.user or "", req.model)
+    return count_prompt_tokens(req.system, req.user or "", req.model) + max_tokens
+
+class TokenBucket:
+    def __init__(self, tokens_per_minute: int):
+        if tokens_per_minute <= 0:
+            raise ValueError("tokens_per_minute must be positive")
+        self.capacity = float(tokens_per_minute)
+        self.__rate = tokens_per_minute / 60.0
+        self.__tokens = self.capacity
+        self.__updated = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def __reserve(self, n: int) -> float:
+        n = min(float(n), self.capacity)
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(self.capacity, self.__tokens + (now - self.__updated) * self.__rate)
+            self.__updated = now
+            self.__tokens -= n
+            if self.__tokens >= 0:
+                return 0.0
+            return -self.__tokens / self.__rate
+
+    def acquire(self, n: int):
+        delay = self.__reserve(n)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self, n: int):
+        delay = self.__reserve(n)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+def _bucket(rate_limit) -> Optional[TokenBucket]:
+    if rate_limit is None or isinstance(rate_limit, TokenBucket):
+        return rate_limit
+    return TokenBucket(int(rate_limit))
+
+def run_batch(generate: Callable[[AIRequest], AIResponse], requests: Iterable[AIRequest], max_concurrency: int = 8, rate_limit=None, ordered: bool = True) -> Iterator[BatchResult]:
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be >= 1")
+    bucket = _bucket(rate_limit)
+
+    def call(index: int, req: AIRequest) -> BatchResult:
+        try:
+            return BatchResult(index=index, request=req, response=generate(req))
+        except Exception as e:
+            return BatchResult(index=index, request=req, error=e)
+
+    source = enumerate(requests)
+    in_flight = set()
+    finished: Dict[int, BatchResult] = {}
+    next_index = 0
+    exhausted = False
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        while True:
+            while not exhausted and len(in_flight) < max_concurrency:
+                item = next(source, None)
+                if item is None:
+                    exhausted = True
+                    break
+                if bucket is not None:
+                    bucket.acquire(estimate_request_tokens(item[1]))
+                in_flight.add(pool.submit(call, *item))
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                res = fut.result()
+                if not ordered:
+                    yield res
+                else:
+                    finished[res.index] = res
+            while next_index in finished:
+                yield finished.pop(next_index)
+                next_index += 1
+
+async def arun_batch(agenerate: Callable[[AIRequest], Awaitable[AIResponse]], requests: Iterable[AIRequest], max_concurrency: int = 8, rate_limit=None, ordered: bool = True) -> AsyncIterator[BatchResult]:
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be >= 1")
+    bucket = _bucket(rate_limit)
+
+    async def call(index: int, req: AIRequest) -> BatchResult:
+        try:
+            return BatchResult(index=index, request=req, response=await agenerate(req))
+        except Exception as e:
+            return BatchResult(index=index, request=req, error=e)
+
+    source = enumerate(requests)
+    in_flight = set()
+    finished: Dict[int, BatchResult] = {}
+    next_index = 0
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(in_flight) < max_concurrency:
+                item = next(source, None)
+                if item is None:
+                    exhausted = True
+                    break
+                if bucket is not None:
+                    await bucket.aacquire(estimate_request_tokens(item[1]))
+                in_flight.add(asyncio.ensure_future(call(*item)))
+            if not in_flight:
+                break
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                res = task.result()
+                if not ordered:
+                    yield res
+                else:
+                    finished[res.index] = res
+            while next_index in finished:
+                yield finished.pop(next_index)
+                next_index += 1
+    finally:
+        for task in in_flight:
+            task.cancel()
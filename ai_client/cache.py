@@ -0,0 +1,130 @@
+
+from __future__ import annotations
+import os, time, sqlite3, hashlib, threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+from . import _json
+from .ai_request import AIRequest
+from .ai_response import AIResponse
+
+def request_key(provider: str, req: AIRequest, default_model: str = "") -> str:
+    payload = [provider, req.model or default_model, req.system or "", req.user, req.temperature, req.max_tokens]
+    return hashlib.sha256(_json.dumps_canonical(payload).encode("utf-8")).hexdigest()
+
+def default_cache_path() -> str:
+    db_path = os.getenv("RECIPE_DB_PATH", "./recipes.db")
+    return os.path.join(os.path.dirname(db_path) or ".", "response_cache.db")
+
+class ResponseCache:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[AIResponse]:
+        res = self._get(key)
+        with self._stats_lock:
+            if res is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return res
+
+    def set(self, key: str, res: AIResponse) -> None:
+        # Callers only hand over responses that already passed validate_recipe.
+        self._set(key, res)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": (self.hits / total) if total else 0.0, "size": len(self)}
+
+    def _get(self, key: str) -> Optional[AIResponse]: ...
+    def _set(self, key: str, res: AIResponse) -> None: ...
+    def clear(self) -> None: ...
+    def __len__(self) -> int: ...
+
+def _from_cached(text: str, model: str) -> AIResponse:
+    return AIResponse(text=text, parsed_json=_json.loads(text), model=model, latency_ms=0, tokens_in=0, tokens_out=0, cached=True)
+
+class MemoryCache(ResponseCache):
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = 3600):
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.__items: "OrderedDict[str, tuple]" = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[AIResponse]:
+        with self.__lock:
+            item = self.__items.get(key)
+            if item is None:
+                return None
+            text, model, stored_at = item
+            if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+                del self.__items[key]
+                return None
+            self.__items.move_to_end(key)
+        return _from_cached(text, model)
+
+    def _set(self, key: str, res: AIResponse) -> None:
+        with self.__lock:
+            self.__items[key] = (res.text, res.model, time.monotonic())
+            self.__items.move_to_end(key)
+            while len(self.__items) > self.max_entries:
+                self.__items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__items.clear()
+
+    def __len__(self) -> int:
+        return len(self.__items)
+
+CACHE_SQL = """
+CREATE TABLE IF NOT EXISTS response_cache (
+  key TEXT PRIMARY KEY,
+  text TEXT NOT NULL,
+  model TEXT NOT NULL,
+  created_at REAL NOT NULL
+);
+""".strip()
+
+class SQLiteCache(ResponseCache):
+    def __init__(self, db_path: Optional[str] = None, ttl_seconds: Optional[float] = None):
+        super().__init__()
+        self.db_path = db_path or default_cache_path()
+        self.ttl_seconds = ttl_seconds
+        self.__lock = threading.Lock()
+        self.__con = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self.__con:
+            self.__con.executescript(CACHE_SQL)
+
+    def _get(self, key: str) -> Optional[AIResponse]:
+        with self.__lock:
+            row = self.__con.execute("SELECT text, model, created_at FROM response_cache WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl_seconds is not None and time.time() - row[2] > self.ttl_seconds:
+                with self.__con:
+                    self.__con.execute("DELETE FROM response_cache WHERE key=?", (key,))
+                return None
+        return _from_cached(row[0], row[1])
+
+    def _set(self, key: str, res: AIResponse) -> None:
+        with self.__lock, self.__con:
+            self.__con.execute(
+                "INSERT OR REPLACE INTO response_cache (key, text, model, created_at) VALUES (?, ?, ?, ?)",
+                (key, res.text, res.model, time.time()),
+            )
+
+    def clear(self) -> None:
+        with self.__lock, self.__con:
+            self.__con.execute("DELETE FROM response_cache")
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__con.close()
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return self.__con.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
@@ -1,61 +1,237 @@
 
-import json, sys
+import time, dataclasses
+from typing import Optional, Iterable, Iterator, AsyncIterator, Union
 from .ai_request import AIRequest
 from .ai_response import AIResponse
-from .providers.provider_mock import MockProvider
-from .providers.provider_openai import OpenAIProvider
-from .validation import validate_recipe
-from .json_repair import repair_json_structure
-
-def _debug_print(header: str, payload: str):
-    try:
-        print(f"\n=== {header} ===", flush=True)
-        print(payload, flush=True)
-    except Exception:
-        pass
+from .provider_base import BaseProvider
+from .providers.registry import get_provider
+from .providers.http_pool import PoolConfig
+from .validation import validate_recipe_field, validate_ingredient, validate_step
+from .json_stream import IncrementalJSONParser, StreamEvent
+from .cache import ResponseCache, request_key
+from .batch import BatchResult, run_batch, arun_batch
+from .singleflight import SingleFlight, default_group
+from .pipeline import RawResponse, postprocess, run_pipeline
+from . import metrics as _metrics
+from .metrics import Metrics, PROVIDER, STORE
+from .tokens import count_prompt_tokens, count_tokens, completion_budget
+from . import usage as _usage
+from .usage import UsageLedger, default_ledger
 
 class AIClient:
-    def __init__(self, provider: str = "mock", model: str = "mock-1"):
-        self.__provider_name = provider
+    def __init__(self, provider: Union[str, BaseProvider] = "mock", model: str = "mock-1", cache: Optional[ResponseCache] = None, pool: Optional[PoolConfig] = None, coalesce: Union[bool, SingleFlight] = False, metrics: Optional[Metrics] = None):
+        # coalesce=True joins identical concurrent generate/agenerate calls (same
+        # request_key) onto one provider call via the process-wide SingleFlight group;
+        # pass a SingleFlight to scope coalescing to a set of clients. provider is a
+        # registered name or a provider instance (e.g. a RouterProvider). Stage timings
+        # and counters (cache, repair, retries) go to metrics (default: the process-wide
+        # registry). Token usage is tallied per model in self.usage and in
+        # usage.default_ledger().
+        self.__provider_name = provider if isinstance(provider, str) else getattr(provider, "name", type(provider).__name__)
         self.__model = model
-        self.__provider = self.__select_provider(provider)
+        self.__provider = self.__select_provider(provider, pool)
+        self.__cache = cache
+        self.__flight = default_group() if coalesce is True else (coalesce or None)
+        self.__metrics = metrics or _metrics.default()
+        self.__usage = UsageLedger()
+
+    @property
+    def metrics(self) -> Metrics:
+        return self.__metrics
+
+    @property
+    def usage(self) -> UsageLedger:
+        return self.__usage
+
+    def prompt_tokens(self, req: AIRequest) -> int:
+        # Pre-flight input token count for req as the provider will receive it.
+        return count_prompt_tokens(req.system, req.user, req.model or self.__model)
+
+    def max_tokens(self, req: AIRequest) -> int:
+        # req.max_tokens, or a budget sized from the schema and the prompt.
+        if req.max_tokens is not None:
+            return req.max_tokens
+        return completion_budget(req.user, req.model or self.__model)
+
+    @property
+    def cache(self) -> Optional[ResponseCache]:
+        return self.__cache
+
+    @property
+    def flight(self) -> Optional[SingleFlight]:
+        return self.__flight
 
     def generate(self, req: AIRequest) -> AIResponse:
-        text, latency_ms, tokens_in, tokens_out = self.__provider.generate(
-            req.system or "", req.user, req.model or self.__model, req.temperature, req.max_tokens
-        )
-        _debug_print("RAW AI RESPONSE", text)
-        _debug_print("USAGE", f"latency_ms={latency_ms}, tokens_in={tokens_in}, tokens_out={tokens_out}")
-
-        parsed = self.__parse_json_or_none(text)
-        if parsed is not None:
-            errs = validate_recipe(parsed)
-            if not errs:
-                return AIResponse(text=text, parsed_json=parsed, model=req.model or self.__model, latency_ms=latency_ms, tokens_in=tokens_in, tokens_out=tokens_out)
-
-        repaired = repair_json_structure(text)
-        if repaired and repaired != text:
-            _debug_print("STRUCTURAL REPAIR (LOCAL)", repaired)
-            parsed_local = self.__parse_json_or_none(repaired)
-            if parsed_local is not None:
-                errs_local = validate_recipe(parsed_local)
-                if not errs_local:
-                    return AIResponse(text=repaired, parsed_json=parsed_local, model=req.model or self.__model, latency_ms=latency_ms, tokens_in=tokens_in, tokens_out=tokens_out)
-
-        if parsed is None:
-            raise ValueError("json_parse_error_after_structural_repair")
-        else:
-            raise ValueError("schema_error_after_structural_repair: " + ";".join(validate_recipe(parsed)))
-
-    def __select_provider(self, name: str):
-        if name == "mock":
-            return MockProvider()
-        if name == "openai":
-            return OpenAIProvider()
-        raise ValueError("unknown provider")
-
-    def __parse_json_or_none(self, text: str):
+        key = self.__cache_key(req)
+        if key is not None:
+            hit = self.__lookup(key)
+            if hit is not None:
+                return self.__hit(hit)
+        if self.__flight is None:
+            return self.__generate(req, key)
+        res, shared = self.__flight.do(self.__flight_key(req, key), lambda: self.__generate(req, key))
+        return self.__hit(dataclasses.replace(res, coalesced=True)) if shared else res
+
+    async def agenerate(self, req: AIRequest) -> AIResponse:
+        key = self.__cache_key(req)
+        if key is not None:
+            hit = self.__lookup(key)
+            if hit is not None:
+                return self.__hit(hit)
+        if self.__flight is None:
+            return await self.__agenerate(req, key)
+        res, shared = await self.__flight.ado(self.__flight_key(req, key), lambda: self.__agenerate(req, key))
+        return self.__hit(dataclasses.replace(res, coalesced=True)) if shared else res
+
+    def fetch(self, req: AIRequest) -> RawResponse:
+        # Pipeline stage 1: the provider call only. postprocess() turns the result
+        # into a validated AIResponse.
+        model = req.model or self.__model
+        with self.__metrics.timer(PROVIDER), _metrics.scoped(self.__metrics), _usage.scoped(self.__usage):
+            out = self.__provider.generate(req.system or "", req.user, model, req.temperature, self.max_tokens(req))
+        return self.__account(req, RawResponse(out[0], model, *out[1:]))
+
+    async def afetch(self, req: AIRequest) -> RawResponse:
+        model = req.model or self.__model
+        with self.__metrics.timer(PROVIDER), _metrics.scoped(self.__metrics), _usage.scoped(self.__usage):
+            out = await self.__provider.agenerate(req.system or "", req.user, model, req.temperature, self.max_tokens(req))
+        return self.__account(req, RawResponse(out[0], model, *out[1:]))
+
+    def __generate(self, req: AIRequest, key: Optional[str]) -> AIResponse:
+        return self.__store(key, postprocess(self.fetch(req), self.__metrics))
+
+    async def __agenerate(self, req: AIRequest, key: Optional[str]) -> AIResponse:
+        return self.__store(key, postprocess(await self.afetch(req), self.__metrics))
+
+    def __flight_key(self, req: AIRequest, key: Optional[str]) -> str:
+        # The leader stores into its own client's cache before the call is released,
+        # so followers arriving later hit the cache instead of starting a new call.
+        return key if key is not None else request_key(self.__provider_name, req, self.__model)
+
+    def stream(self, req: AIRequest, abort_on_invalid: bool = True) -> Iterator[StreamEvent]:
+        # Yields "delta" events for raw text, "field"/"item" events as recipe parts close,
+        # and a final "done" event carrying the validated AIResponse.
+        key = self.__cache_key(req)
+        if key is not None:
+            hit = self.__lookup(key)
+            if hit is not None:
+                yield StreamEvent(kind="done", value=self.__hit(hit), partial=hit.parsed_json)
+                return
+        t0 = time.time()
+        model = req.model or self.__model
+        parser = IncrementalJSONParser()
+        deltas = self.__provider.stream(req.system or "", req.user, model, req.temperature, self.max_tokens(req))
+        finished = False
         try:
-            return json.loads(text)
-        except Exception:
+            while True:
+                try:
+                    # Scoped per step: the provider generator runs on the consumer's context.
+                    with _metrics.scoped(self.__metrics):
+                        delta = next(deltas)
+                except StopIteration as stop:
+                    usage = stop.value or (0, 0)
+                    break
+                yield StreamEvent(kind="delta", value=delta)
+                for ev in parser.feed(delta):
+                    if abort_on_invalid:
+                        errs = self.__early_errors(parser, ev)
+                        if errs:
+                            raise ValueError("schema_error_during_stream: " + ";".join(errs))
+                    yield ev
+            finished = True
+        finally:
+            deltas.close()
+            if not finished and parser.text:
+                # Aborted (invalid field, provider error or the consumer closing the
+                # stream): the text received so far was still generated and billed.
+                self.__account(req, RawResponse(parser.text, model, int((time.time() - t0) * 1000), 0, 0))
+        elapsed_ms = (time.time() - t0) * 1000
+        latency_ms = int(elapsed_ms)
+        self.__metrics.observe(PROVIDER, elapsed_ms)
+        raw = self.__account(req, RawResponse(parser.text, model, latency_ms, *usage))
+        res = self.__store(key, postprocess(raw, self.__metrics))
+        yield StreamEvent(kind="done", value=res, partial=res.parsed_json)
+
+    def __early_errors(self, parser: IncrementalJSONParser, ev: StreamEvent):
+        if parser.root_kind != "{":
+            return ["root not object"]
+        if ev.kind == "item":
+            if ev.key == "ingredients":
+                return validate_ingredient(ev.value, ev.index)
+            if ev.key == "steps":
+                return validate_step(ev.value, ev.index)
+            return []
+        if ev.key in ("ingredients", "steps") and isinstance(ev.value, list):
+            return []  # elements were already checked as they closed
+        return validate_recipe_field(ev.key, ev.value)
+
+    def generate_many(self, requests: Iterable[AIRequest], max_concurrency: int = 8, rate_limit=None, ordered: bool = True) -> Iterator[BatchResult]:
+        # rate_limit is a tokens-per-minute budget (int) or a shared TokenBucket.
+        return run_batch(self.generate, requests, max_concurrency=max_concurrency, rate_limit=rate_limit, ordered=ordered)
+
+    def agenerate_many(self, requests: Iterable[AIRequest], max_concurrency: int = 32, rate_limit=None, ordered: bool = True) -> AsyncIterator[BatchResult]:
+        return arun_batch(self.agenerate, requests, max_concurrency=max_concurrency, rate_limit=rate_limit, ordered=ordered)
+
+    def generate_pipeline(self, requests: Iterable[AIRequest], max_concurrency: int = 8, rate_limit=None, workers: Optional[int] = None, chunk_size: int = 16, ordered: bool = True, store=None, user_id: Optional[str] = None) -> Iterator[BatchResult]:
+        # Like generate_many, but parsing, repair and validation run in chunks on a
+        # process pool (see pipeline.run_pipeline) so they do not compete with the
+        # fetch threads for the GIL. Valid recipes are cached and, with store=, saved
+        # per chunk via save_many(upsert=True).
+        def fetch(req: AIRequest):
+            key = self.__cache_key(req)
+            hit = self.__lookup(key) if key is not None else None
+            return self.__hit(hit) if hit is not None else self.fetch(req)
+
+        def on_chunk(results):
+            done = [r for r in results if r.ok]
+            with self.__metrics.timer(STORE):
+                if self.__cache is not None:
+                    for r in done:
+                        if not r.response.cached:
+                            self.__cache.set(self.__cache_key(r.request), r.response)
+                if store is not None and done:
+                    store.save_many([r.response.parsed_json for r in done], user_id=user_id, upsert=True)
+
+        return run_pipeline(fetch, requests, max_concurrency=max_concurrency, rate_limit=rate_limit, workers=workers, chunk_size=chunk_size, ordered=ordered, on_chunk=on_chunk, metrics=self.__metrics)
+
+    def __account(self, req: AIRequest, raw: RawResponse) -> RawResponse:
+        # Fills in counts the provider did not report from local token counting, then
+        # records the call. Tokens are spent whether or not the output validates.
+        estimated = False
+        if not raw.tokens_in:
+            raw.tokens_in = self.prompt_tokens(req)
+            estimated = True
+        if not raw.tokens_out and raw.text:
+            raw.tokens_out = count_tokens(raw.text, raw.model)
+            estimated = True
+        for ledger in (self.__usage, default_ledger()):
+            ledger.record(raw.model, raw.tokens_in, raw.tokens_out, raw.tokens_cached, estimated)
+        return raw
+
+    def __hit(self, res: AIResponse) -> AIResponse:
+        for ledger in (self.__usage, default_ledger()):
+            ledger.record_hit(res.model, coalesced=res.coalesced)
+        return res
+
+    def __lookup(self, key: str) -> Optional[AIResponse]:
+        # Caches may be shared between clients, so hits and misses are counted here.
+        hit = self.__cache.get(key)
+        self.__metrics.incr(_metrics.CACHE_MISS if hit is None else _metrics.CACHE_HIT)
+        return hit
+
+    def __cache_key(self, req: AIRequest) -> Optional[str]:
+        if self.__cache is None:
             return None
+        return request_key(self.__provider_name, req, self.__model)
+
+    def __store(self, key: Optional[str], res: AIResponse) -> AIResponse:
+        # postprocess only returns schema-valid responses; failures raise before reaching here.
+        if key is not None:
+            with self.__metrics.timer(STORE):
+                self.__cache.set(key, res)
+        return res
+
+    def __select_provider(self, provider: Union[str, BaseProvider], pool: Optional[PoolConfig]):
+        if isinstance(provider, BaseProvider):
+            return provider
+        return get_provider(provider, pool=pool)
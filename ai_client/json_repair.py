@@ -1,5 +1,5 @@
 
-import re
+import re, json
 
 def strip_code_fences(s: str) -> str:
     s = s.strip()
@@ -61,15 +61,92 @@ def balance_brackets(s: str) -> str:
         out.append(stack.pop())
     return "".join(out)
 
+# Tokens: a run of plain content (whitespace, literals, colons, complete
+# double-quoted strings and commas that are not trailing), a structural bracket,
+# a trailing comma with its whitespace, a single-quoted or unterminated string,
+# or a run of backticks. Only brackets and the rare cases reach Python code, so
+# the scan stays in the regex engine for almost all of the input.
+_TOKEN = re.compile(
+    r'(?P<run>(?:"[^"\\]*(?:\\.[^"\\]*)*"|[^"\'{}\[\],`]+|,(?!\s*[}\]]))+)'
+    r"|(?P<bracket>[{}\[\]])"
+    r"|(?P<comma>,\s*)"
+    r'|(?P<dq>"[^"\\]*(?:\\.[^"\\]*)*\\?\Z)'
+    r"|(?P<sq>'[^'\\]*(?:\\.[^'\\]*)*(?:'|\\?\Z))"
+    r"|(?P<tick>`+)",
+    re.S,
+)
+_DECODER = json.JSONDecoder()
+_SQ_ESCAPE = re.compile(r'\\.|"', re.S)
+_CLOSERS = {"{": "}", "[": "]"}
+
+def _close_string(tok: str) -> str:
+    # Unterminated string at end of input: drop a dangling escape and close it.
+    body = tok[1:]
+    if (len(body) - len(body.rstrip("\\"))) % 2:
+        body = body[:-1]
+    return tok[0] + body + tok[0]
+
+def _requote(tok: str) -> str:
+    if len(tok) < 2 or tok[-1] != "'" or (len(tok) - 1 - len(tok[:-1].rstrip("\\"))) % 2:
+        tok = _close_string(tok)
+    body = _SQ_ESCAPE.sub(lambda m: "'" if m.group(0) == "\\'" else ('\\"' if m.group(0) == '"' else m.group(0)), tok[1:-1])
+    return '"' + body + '"'
+
 def repair_json_structure(text: str) -> str:
+    # One linear scan (after a C-level attempt to decode the root value in place):
+    # skips fences/leading prose, drops trailing commas outside strings,
+    # re-quotes single-quoted strings and stops at the end of the first complete root
+    # value. Truncated input is cut back to the last closed container (dropping the
+    # partial element after it) before the open brackets are closed.
     if not isinstance(text, str):
         try:
             text = str(text)
         except Exception:
             return ""
-    s = strip_code_fences(text)
-    s = extract_json_region(s)
-    s = remove_trailing_commas(s)
-    s = balance_brackets(s)
-    s = remove_trailing_commas(s)
-    return s.strip()
+    start_obj = text.find("{")
+    start_arr = text.find("[")
+    starts = [i for i in [start_obj, start_arr] if i != -1]
+    if not starts:
+        return strip_code_fences(text)
+    start = min(starts)
+    try:
+        # Fast path: the root value is intact and only wrapped in fences or prose.
+        _, end = _DECODER.raw_decode(text, start)
+        return text[start:end]
+    except ValueError:
+        pass
+    out, stack = [], []
+    checkpoint = None
+    for m in _TOKEN.finditer(text, start):
+        kind = m.lastgroup
+        if kind == "run":
+            out.append(m.group())
+        elif kind == "bracket":
+            c = m.group()
+            if c == "{" or c == "[":
+                out.append(c)
+                stack.append(_CLOSERS[c])
+            elif stack and stack[-1] == c:
+                out.append(c)
+                stack.pop()
+                if not stack:
+                    break
+                checkpoint = (len(out), tuple(stack))
+        elif kind == "dq":
+            out.append(_close_string(m.group()))
+        elif kind == "sq":
+            out.append(_requote(m.group()))
+        elif kind == "tick":
+            if len(m.group()) >= 3:
+                break
+            out.append(m.group())
+    if stack:
+        if checkpoint is not None:
+            del out[checkpoint[0]:]
+            stack = list(checkpoint[1])
+        if out:
+            tail = out[-1].rstrip()
+            out[-1] = tail[:-1] if tail.endswith(",") else tail
+    while stack:
+        out.append(stack.pop())
+    return "".join(out).strip()
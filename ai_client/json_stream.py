@@ -0,0 +1,153 @@
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from . import _json
+
+@dataclass
+class StreamEvent:
+    kind: str
+    key: str = ""
+    value: Any = None
+    index: Optional[int] = None
+    partial: Optional[Dict[str, Any]] = None
+
+_UNPARSED = object()
+
+class _Frame:
+    __slots__ = ("kind", "start", "expect_key", "key", "value_start", "count")
+
+    def __init__(self, kind: str, start: int):
+        self.kind = kind
+        self.start = start
+        self.expect_key = kind == "{"
+        self.key = None
+        self.value_start = -1
+        self.count = 0
+
+class IncrementalJSONParser:
+    # Same string/escape/bracket state machine as json_repair.balance_brackets, run
+    # incrementally. Emits completed root-level fields and the completed elements of
+    # root-level arrays (ingredients, steps) as soon as their closing bracket arrives.
+    def __init__(self):
+        self.__text = ""
+        self.__pos = 0
+        self.__stack: List[_Frame] = []
+        self.__started = False
+        self.__in_str = False
+        self.__esc = False
+        self.__str_start = -1
+        self.__root: Optional[_Frame] = None
+        self.root_kind: Optional[str] = None
+        self.done = False
+        self.partial: Dict[str, Any] = {}
+
+    @property
+    def text(self) -> str:
+        return self.__text
+
+    def feed(self, chunk: str) -> List[StreamEvent]:
+        events: List[StreamEvent] = []
+        if not chunk:
+            return events
+        self.__text += chunk
+        if self.done:
+            return events
+        s = self.__text
+        n = len(s)
+        i = self.__pos
+        stack = self.__stack
+        while i < n:
+            ch = s[i]
+            if not self.__started:
+                if ch in "{[":
+                    self.__started = True
+                    self.root_kind = ch
+                    self.__root = _Frame(ch, i)
+                    stack.append(self.__root)
+                i += 1
+                continue
+            if self.__in_str:
+                if self.__esc:
+                    self.__esc = False
+                elif ch == "\\":
+                    self.__esc = True
+                elif ch == "\"":
+                    self.__in_str = False
+                    top = stack[-1]
+                    if top.kind == "{" and top.expect_key:
+                        key = self.__load(s[self.__str_start:i + 1])
+                        top.key = None if key is _UNPARSED else key
+                        top.expect_key = False
+                i += 1
+                continue
+            if ch == "\"":
+                self.__in_str = True
+                self.__str_start = i
+            elif ch in "{[":
+                stack.append(_Frame(ch, i))
+            elif ch in "}]":
+                if not stack or (ch == "}") != (stack[-1].kind == "{"):
+                    i += 1
+                    continue
+                frame = stack.pop()
+                if frame.kind == "{":
+                    self.__end_primitive(frame, s, i, events)
+                if not stack:
+                    self.done = True
+                    self.__pos = i + 1
+                    return events
+                self.__end_container(frame, s, i, events)
+            elif ch == ":":
+                top = stack[-1]
+                if top.kind == "{":
+                    top.value_start = i + 1
+            elif ch == ",":
+                top = stack[-1]
+                if top.kind == "{":
+                    self.__end_primitive(top, s, i, events)
+                    top.expect_key = True
+                else:
+                    top.count += 1
+            i += 1
+        self.__pos = n
+        return events
+
+    def __end_container(self, frame: _Frame, s: str, end: int, events: List[StreamEvent]):
+        parent = self.__stack[-1]
+        depth = len(self.__stack)
+        if parent.kind == "{":
+            parent.value_start = -1
+            if depth == 1 and parent.key is not None:
+                value = self.__load(s[frame.start:end + 1])
+                if value is _UNPARSED:
+                    return
+                self.partial[parent.key] = value
+                events.append(StreamEvent(kind="field", key=parent.key, value=value, partial=self.partial))
+        elif depth == 2 and self.__stack[0].kind == "{" and self.__stack[0].key is not None and frame.kind == "{":
+            key = self.__stack[0].key
+            value = self.__load(s[frame.start:end + 1])
+            if value is _UNPARSED:
+                return
+            items = self.partial.setdefault(key, [])
+            if isinstance(items, list):
+                items.append(value)
+            events.append(StreamEvent(kind="item", key=key, value=value, index=parent.count, partial=self.partial))
+
+    def __end_primitive(self, frame: _Frame, s: str, end: int, events: List[StreamEvent]):
+        if frame.value_start < 0:
+            return
+        raw = s[frame.value_start:end].strip()
+        frame.value_start = -1
+        if raw and frame is self.__root and frame.key is not None:
+            value = self.__load(raw)
+            if value is _UNPARSED:
+                return
+            self.partial[frame.key] = value
+            events.append(StreamEvent(kind="field", key=frame.key, value=value, partial=self.partial))
+
+    def __load(self, raw: str) -> Any:
+        # Fragments that only parse after repair are left for the final pipeline.
+        try:
+            return _json.loads(raw)
+        except Exception:
+            return _UNPARSED
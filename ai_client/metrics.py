@@ -0,0 +1,238 @@
+
+import bisect, contextvars, logging, os, random, threading, time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+from . import _json
+
+# Stage timers (milliseconds) and event counters for the request hot path. Recording
+# is a dict lookup and a bisect under a lock; what happens to the numbers is up to
+# the sinks attached to a Metrics instance.
+PROVIDER = "provider"
+PARSE = "parse"
+REPAIR = "repair"
+VALIDATE = "validate"
+STORE = "store"
+STAGES = (PROVIDER, PARSE, REPAIR, VALIDATE, STORE)
+
+CACHE_HIT = "cache_hit"
+CACHE_MISS = "cache_miss"
+REPAIR_SUCCESS = "repair_success"
+REPAIR_FAILURE = "repair_failure"
+PARSE_FAILURE = "parse_failure"
+SCHEMA_FAILURE = "schema_failure"
+RETRY = "retry"
+
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+class Histogram:
+    # Fixed-bucket latency histogram; counts[i] holds values <= bounds[i], the last
+    # slot everything larger.
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds: Iterable[float] = BUCKETS_MS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, counts: List[int], total: float):
+        for i, c in enumerate(counts):
+            self.counts[i] += c
+        self.count += sum(counts)
+        self.sum += total
+
+    def percentile(self, q: float) -> Optional[float]:
+        # Linear interpolation inside the bucket holding the q-th value (0 < q <= 1).
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                lo = self.bounds[i - 1] if i > 0 else 0.0
+                hi = self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+                return lo + (hi - lo) * (rank - seen) / c
+            seen += c
+        return float(self.bounds[-1])
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+class Sink:
+    def observe(self, stage: str, ms: float): ...
+    def incr(self, event: str, n: int = 1): ...
+    def merge(self, snapshot: Dict[str, Any]): ...
+
+class MemorySink(Sink):
+    def __init__(self, bounds: Iterable[float] = BUCKETS_MS):
+        self.bounds = tuple(bounds)
+        self.__timers: Dict[str, Histogram] = {}
+        self.__counters: Dict[str, int] = {}
+        self.__lock = threading.Lock()
+
+    def observe(self, stage: str, ms: float):
+        with self.__lock:
+            h = self.__timers.get(stage)
+            if h is None:
+                h = self.__timers[stage] = Histogram(self.bounds)
+            h.observe(ms)
+
+    def incr(self, event: str, n: int = 1):
+        with self.__lock:
+            self.__counters[event] = self.__counters.get(event, 0) + n
+
+    def merge(self, snapshot: Dict[str, Any]):
+        with self.__lock:
+            for stage, t in snapshot.get("timers", {}).items():
+                h = self.__timers.get(stage)
+                if h is None:
+                    h = self.__timers[stage] = Histogram(self.bounds)
+                h.merge(t["counts"], t["sum"])
+            for event, n in snapshot.get("counters", {}).items():
+                self.__counters[event] = self.__counters.get(event, 0) + n
+
+    def histogram(self, stage: str) -> Optional[Histogram]:
+        return self.__timers.get(stage)
+
+    def snapshot(self) -> Dict[str, Any]:
+        # Plain, picklable data; Metrics.merge accepts it from worker processes.
+        with self.__lock:
+            return {
+                "timers": {s: {"counts": list(h.counts), "sum": h.sum} for s, h in self.__timers.items()},
+                "counters": dict(self.__counters),
+            }
+
+    def summary(self) -> Dict[str, Any]:
+        with self.__lock:
+            timers = {
+                s: {"count": h.count, "mean_ms": h.mean, "p50_ms": h.percentile(0.5), "p95_ms": h.percentile(0.95), "p99_ms": h.percentile(0.99)}
+                for s, h in self.__timers.items()
+            }
+            return {"timers": timers, "counters": dict(self.__counters)}
+
+    def reset(self):
+        with self.__lock:
+            self.__timers.clear()
+            self.__counters.clear()
+
+class PrometheusSink(MemorySink):
+    def __init__(self, prefix: str = "ai_client", bounds: Iterable[float] = BUCKETS_MS):
+        super().__init__(bounds)
+        self.prefix = prefix
+
+    def render(self) -> str:
+        # Prometheus text exposition format (version 0.0.4).
+        snap = self.snapshot()
+        p = self.prefix
+        lines = [f"# HELP {p}_stage_ms Time spent per request stage in milliseconds.", f"# TYPE {p}_stage_ms histogram"]
+        for stage, t in sorted(snap["timers"].items()):
+            cumulative = 0
+            for bound, c in zip(self.bounds + ("+Inf",), t["counts"]):
+                cumulative += c
+                lines.append(f'{p}_stage_ms_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{p}_stage_ms_sum{{stage="{stage}"}} {t["sum"]}')
+            lines.append(f'{p}_stage_ms_count{{stage="{stage}"}} {cumulative}')
+        lines += [f"# HELP {p}_events_total Hot-path events (cache hits, repairs, retries, ...).", f"# TYPE {p}_events_total counter"]
+        for event, n in sorted(snap["counters"].items()):
+            lines.append(f'{p}_events_total{{event="{event}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+class JSONLogSink(Sink):
+    # One JSON object per observation on a logging.Logger, so handlers (and their
+    # levels) decide where it goes and whether formatting happens at all.
+    def __init__(self, logger: Union[str, logging.Logger] = "ai_client.metrics", level: int = logging.INFO):
+        self.logger = logging.getLogger(logger) if isinstance(logger, str) else logger
+        self.level = level
+
+    def observe(self, stage: str, ms: float):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, _json.dumps({"type": "timer", "stage": stage, "ms": round(ms, 3)}))
+
+    def incr(self, event: str, n: int = 1):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, _json.dumps({"type": "counter", "event": event, "n": n}))
+
+    def merge(self, snapshot: Dict[str, Any]):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, _json.dumps({"type": "snapshot", **snapshot}))
+
+class Metrics:
+    def __init__(self, sinks: Optional[Iterable[Sink]] = None):
+        self.sinks: List[Sink] = list(sinks) if sinks is not None else [MemorySink()]
+
+    def observe(self, stage: str, ms: float):
+        for s in self.sinks:
+            s.observe(stage, ms)
+
+    def incr(self, event: str, n: int = 1):
+        for s in self.sinks:
+            s.incr(event, n)
+
+    def merge(self, snapshot: Dict[str, Any]):
+        for s in self.sinks:
+            s.merge(snapshot)
+
+    @contextmanager
+    def timer(self, stage: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, (time.perf_counter() - t0) * 1000)
+
+    def memory(self) -> Optional[MemorySink]:
+        return next((s for s in self.sinks if isinstance(s, MemorySink)), None)
+
+    def add_sink(self, sink: Sink) -> Sink:
+        self.sinks = self.sinks + [sink]
+        return sink
+
+    def remove_sink(self, sink: Sink):
+        self.sinks = [s for s in self.sinks if s is not sink]
+
+_DEFAULT = Metrics()
+
+def default() -> Metrics:
+    # Process-wide registry for callers that are not given a Metrics instance.
+    return _DEFAULT
+
+# The registry of the client whose provider call is running. Providers are shared
+# between clients, so code below the provider boundary (RetryPolicy) reports here.
+_CURRENT: contextvars.ContextVar = contextvars.ContextVar("ai_client_metrics", default=None)
+
+def current() -> Metrics:
+    m = _CURRENT.get()
+    return m if m is not None else _DEFAULT
+
+@contextmanager
+def scoped(m: Metrics):
+    token = _CURRENT.set(m)
+    try:
+        yield m
+    finally:
+        _CURRENT.reset(token)
+
+# Debug dumps of raw responses: off unless the "ai_client.debug" logger is enabled for
+# DEBUG, and then only for a sampled fraction of calls (AI_CLIENT_DEBUG_SAMPLE, 0..1).
+debug_logger = logging.getLogger("ai_client.debug")
+_sample_rate = float(os.getenv("AI_CLIENT_DEBUG_SAMPLE", "1.0"))
+
+def enable_debug(sample_rate: float = 1.0, handler: Optional[logging.Handler] = None):
+    global _sample_rate
+    _sample_rate = sample_rate
+    debug_logger.setLevel(logging.DEBUG)
+    if handler is not None or not debug_logger.handlers:
+        debug_logger.addHandler(handler or logging.StreamHandler())
+
+def debug_sampled() -> bool:
+    # Decide once per response so a sampled response is dumped in full.
+    return debug_logger.isEnabledFor(logging.DEBUG) and (_sample_rate >= 1.0 or random.random() < _sample_rate)
+
+def debug_dump(header: str, payload: Union[str, Callable[[], str]]):
+    debug_logger.debug("=== %s ===\n%s", header, payload() if callable(payload) else payload)
@@ -0,0 +1,180 @@
+
+import multiprocessing, os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from . import _json, metrics as _metrics
+from .ai_request import AIRequest
+from .ai_response import AIResponse
+from .batch import BatchResult, run_batch
+from .validation import validate_recipe, is_valid_recipe
+from .json_repair import repair_json_structure
+from .metrics import Metrics, MemorySink, PARSE, REPAIR, VALIDATE, REPAIR_SUCCESS, REPAIR_FAILURE, PARSE_FAILURE, SCHEMA_FAILURE
+
+# AIClient.generate is fetch -> postprocess -> (cache). Everything here is
+# module-level and picklable so the postprocess stage can run in worker processes.
+
+@dataclass
+class RawResponse:
+    # Provider output before any parsing; what the fetch stage hands on.
+    text: str
+    model: str
+    latency_ms: int
+    tokens_in: int
+    tokens_out: int
+    tokens_cached: int = 0
+
+def _parse_json_or_none(text: str):
+    try:
+        return _json.loads(text)
+    except Exception:
+        return None
+
+def postprocess(raw: RawResponse, metrics: Optional[Metrics] = None) -> AIResponse:
+    # Parse, locally repair if needed, and validate. Raises ValueError when the
+    # text is not a valid recipe even after structural repair.
+    m = metrics or _metrics.default()
+    debug = _metrics.debug_sampled()
+    if debug:
+        _metrics.debug_dump("RAW AI RESPONSE", raw.text)
+        _metrics.debug_dump("USAGE", f"latency_ms={raw.latency_ms}, tokens_in={raw.tokens_in}, tokens_out={raw.tokens_out}, tokens_cached={raw.tokens_cached}")
+
+    with m.timer(PARSE):
+        parsed = _parse_json_or_none(raw.text)
+    if parsed is None:
+        m.incr(PARSE_FAILURE)
+    else:
+        with m.timer(VALIDATE):
+            valid = is_valid_recipe(parsed)
+        if valid:
+            return AIResponse(text=raw.text, parsed_json=parsed, model=raw.model, latency_ms=raw.latency_ms, tokens_in=raw.tokens_in, tokens_out=raw.tokens_out, tokens_cached=raw.tokens_cached)
+
+    with m.timer(REPAIR):
+        repaired = repair_json_structure(raw.text)
+        changed = bool(repaired) and repaired != raw.text
+        parsed_local = _parse_json_or_none(repaired) if changed else None
+    if changed and debug:
+        _metrics.debug_dump("STRUCTURAL REPAIR (LOCAL)", repaired)
+    if parsed_local is not None:
+        with m.timer(VALIDATE):
+            valid = is_valid_recipe(parsed_local)
+        if valid:
+            m.incr(REPAIR_SUCCESS)
+            return AIResponse(text=repaired, parsed_json=parsed_local, model=raw.model, latency_ms=raw.latency_ms, tokens_in=raw.tokens_in, tokens_out=raw.tokens_out, tokens_cached=raw.tokens_cached)
+
+    m.incr(REPAIR_FAILURE)
+    if parsed is None:
+        raise ValueError("json_parse_error_after_structural_repair")
+    else:
+        m.incr(SCHEMA_FAILURE)
+        raise ValueError("schema_error_after_structural_repair: " + ";".join(validate_recipe(parsed)))
+
+def postprocess_chunk(raws: List[RawResponse]) -> Tuple[List[Tuple[Optional[AIResponse], Optional[Exception]]], Dict[str, Any]]:
+    # One task per chunk amortizes the pickling round trip over several responses.
+    # Metrics recorded in a worker process are returned as a snapshot for the parent.
+    local = Metrics([MemorySink()])
+    out = []
+    for raw in raws:
+        try:
+            out.append((postprocess(raw, local), None))
+        except Exception as e:
+            out.append((None, e))
+    return out, local.memory().snapshot()
+
+def _worker_context():
+    # Never fork: fetch threads may hold locks (HTTP pool, SQLite, metrics) at that
+    # moment, and a forked worker would inherit them held.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+def _completed(value: Any) -> Future:
+    fut = Future()
+    fut.set_result(value)
+    return fut
+
+def run_pipeline(
+    fetch: Callable[[AIRequest], Union[RawResponse, AIResponse]],
+    requests: Iterable[AIRequest],
+    max_concurrency: int = 8,
+    rate_limit=None,
+    workers: Optional[int] = None,
+    chunk_size: int = 16,
+    ordered: bool = True,
+    on_chunk: Optional[Callable[[List[BatchResult]], None]] = None,
+    metrics: Optional[Metrics] = None,
+) -> Iterator[BatchResult]:
+    # Fetches on up to max_concurrency threads and post-processes RawResponses in
+    # chunks on a process pool (workers=None: one per core, 0: inline on this thread).
+    # fetch may return a finished AIResponse (e.g. a cache hit) to skip postprocess.
+    # on_chunk sees each finished chunk before its results are yielded. At most two
+    # chunks per worker are queued, so a slow postprocess stage throttles fetching.
+    # Postprocess metrics from each chunk are merged into metrics (default registry).
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be >= 1")
+    n_workers = workers if workers is not None else (os.cpu_count() or 1)
+    executor = ProcessPoolExecutor(n_workers, mp_context=_worker_context()) if n_workers > 0 else None
+    max_pending = 2 * max(n_workers, 1)
+    m = metrics or _metrics.default()
+    pending = deque()
+
+    def submit(chunk: List[BatchResult]):
+        raws = [r.response for r in chunk if r.ok and isinstance(r.response, RawResponse)]
+        if not raws:
+            fut = _completed(([], None))
+        elif executor is None:
+            fut = _completed(postprocess_chunk(raws))
+        else:
+            fut = executor.submit(postprocess_chunk, raws)
+        pending.append((chunk, fut))
+
+    def finish(chunk: List[BatchResult], fut: Future) -> List[BatchResult]:
+        try:
+            results, snapshot = fut.result()
+            outcomes = iter(results)
+            if snapshot:
+                m.merge(snapshot)
+        except Exception as e:
+            outcomes = None
+            failure = e
+        for r in chunk:
+            if r.ok and isinstance(r.response, RawResponse):
+                res, err = next(outcomes) if outcomes is not None else (None, failure)
+                r.response, r.error = res, err
+        if on_chunk is not None:
+            on_chunk(chunk)
+        return chunk
+
+    def ready(block: bool) -> List[BatchResult]:
+        # Finished chunks: the oldest first when ordered, else whichever are done.
+        if not pending:
+            return []
+        if ordered:
+            out = []
+            while pending and (pending[0][1].done() or (block and not out)):
+                out.extend(finish(*pending.popleft()))
+            return out
+        done, _ = wait([fut for _, fut in pending], timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        out = []
+        for item in [p for p in pending if p[1] in done]:
+            pending.remove(item)
+            out.extend(finish(*item))
+        return out
+
+    chunk: List[BatchResult] = []
+    try:
+        for fetched in run_batch(fetch, requests, max_concurrency=max_concurrency, rate_limit=rate_limit, ordered=ordered):
+            chunk.append(fetched)
+            if len(chunk) >= chunk_size:
+                submit(chunk)
+                chunk = []
+                while len(pending) > max_pending:
+                    yield from ready(block=True)
+            yield from ready(block=False)
+        if chunk:
+            submit(chunk)
+        while pending:
+            yield from ready(block=True)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,32 @@
+
+import functools
+from typing import Dict, List, Optional
+from . import _json
+from .recipe_schema import SCHEMA_VERSION, schema_description
+
+SYSTEM_GUARD = "You are a culinary assistant. Return ONLY valid JSON matching the requested schema. Do not include markdown or explanations."
+RULES = "Rules: output JSON ONLY."
+
+# Providers cache prompts by exact prefix, so the part shared by every request (schema
+# and rules) leads the system message and the caller's system text follows it.
+
+@functools.lru_cache(maxsize=None)
+def schema_text(version: int = SCHEMA_VERSION) -> str:
+    return _json.dumps(schema_description())
+
+@functools.lru_cache(maxsize=None)
+def stable_prefix(version: int = SCHEMA_VERSION) -> str:
+    return "Schema:" + schema_text(version) + "\n" + RULES + "\n"
+
+@functools.lru_cache(maxsize=256)
+def _render(system: str, version: int) -> str:
+    return stable_prefix(version) + system
+
+def system_message(system: Optional[str]) -> str:
+    return _render(system or SYSTEM_GUARD, SCHEMA_VERSION)
+
+def messages(system: Optional[str], user: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": system_message(system)},
+        {"role": "user", "content": user},
+    ]
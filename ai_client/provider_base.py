@@ -1,8 +1,21 @@
 
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Tuple
+from typing import Tuple, Iterator
 
 class BaseProvider(ABC):
+    # generate/agenerate return (text, latency_ms, tokens_in, tokens_out) and may append
+    # tokens_cached, the prompt tokens the provider served from its prefix cache.
     @abstractmethod
     def generate(self, system: str, user: str, model: str, temperature: float | None, max_tokens: int | None) -> Tuple[str, int, int, int]:
         pass
+
+    async def agenerate(self, system: str, user: str, model: str, temperature: float | None, max_tokens: int | None) -> Tuple[str, int, int, int]:
+        # Providers without a native async client fall back to a worker thread.
+        return await asyncio.to_thread(self.generate, system, user, model, temperature, max_tokens)
+
+    def stream(self, system: str, user: str, model: str, temperature: float | None, max_tokens: int | None) -> Iterator[str]:
+        # Yields text deltas and returns (tokens_in, tokens_out[, tokens_cached]) when exhausted.
+        text, _, *usage = self.generate(system, user, model, temperature, max_tokens)
+        yield text
+        return tuple(usage)
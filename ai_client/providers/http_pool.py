@@ -0,0 +1,32 @@
+
+from dataclasses import dataclass
+
+@dataclass(frozen=True)
+class PoolConfig:
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    timeout: float = 60.0
+    connect_timeout: float = 10.0
+    http2: bool = False
+
+def _httpx_options(pool: PoolConfig) -> dict:
+    import httpx
+    return dict(
+        limits=httpx.Limits(
+            max_connections=pool.max_connections,
+            max_keepalive_connections=pool.max_keepalive_connections,
+            keepalive_expiry=pool.keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(pool.timeout, connect=pool.connect_timeout),
+        http2=pool.http2,
+    )
+
+def build_http_client(pool: PoolConfig):
+    # http2=True needs the optional h2 package (pip install httpx[http2]).
+    import httpx
+    return httpx.Client(**_httpx_options(pool))
+
+def build_async_http_client(pool: PoolConfig):
+    import httpx
+    return httpx.AsyncClient(**_httpx_options(pool))
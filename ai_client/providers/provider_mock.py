@@ -1,11 +1,189 @@
 
-import json, time, hashlib, random
-from typing import Tuple
+import os, time, hashlib, random, asyncio, threading
+from dataclasses import dataclass
+from typing import Tuple, Iterator, Optional, Dict
+from .. import _json
 from ..provider_base import BaseProvider
+from ..retry import RetryPolicy
+from ..tokens import count_prompt_tokens, count_tokens
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+FAULTS = ("fenced", "prose", "truncated", "trailing_comma")
+
+@dataclass(frozen=True)
+class MockProfile:
+    # Simulated backend behaviour. latency_ms is the fixed value, the mean (uniform,
+    # exponential) or the median (lognormal, spread by latency_sigma) of the whole call;
+    # streams spend ttft_ms before the first chunk, then pace chunks at tokens_per_s
+    # (or spread the rest of the latency evenly when it is 0). The *_rate fields are
+    # per-call probabilities; rate-limited calls fail with a 429 before any output.
+    latency: str = "fixed"
+    latency_ms: float = 0.0
+    latency_sigma: float = 0.5
+    max_latency_ms: float = 120000.0
+    ttft_ms: float = 0.0
+    tokens_per_s: float = 0.0
+    chunk_tokens: int = 4
+    fenced_rate: float = 0.0
+    prose_rate: float = 0.0
+    truncated_rate: float = 0.0
+    trailing_comma_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after_s: float = 1.0
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        if self.latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"unknown latency distribution: {self.latency}")
+        if sum(getattr(self, f + "_rate") for f in FAULTS) > 1.0:
+            raise ValueError("malformed-output rates must sum to at most 1")
+
+    @classmethod
+    def from_env(cls) -> "MockProfile":
+        # MOCK_PROFILE holds a JSON object of MockProfile fields; MOCK_LATENCY_MS is a
+        # shorthand for a fixed latency.
+        fields = _json.loads(os.getenv("MOCK_PROFILE") or "{}")
+        if os.getenv("MOCK_LATENCY_MS"):
+            fields.setdefault("latency_ms", float(os.getenv("MOCK_LATENCY_MS")))
+        return cls(**fields)
+
+class _Response:
+    def __init__(self, headers: Dict[str, str]):
+        self.status_code = 429
+        self.headers = headers
+
+class MockRateLimitError(Exception):
+    # Shaped like an SDK 429 so classify_error and Retry-After handling treat it as one.
+    def __init__(self, retry_after_s: float):
+        super().__init__("Rate limit reached (simulated)")
+        self.status_code = 429
+        self.response = _Response({"retry-after": str(retry_after_s)})
 
 class MockProvider(BaseProvider):
+    # Deterministic recipes (seeded by the prompt) with simulated latency, streaming,
+    # malformed output and rate limiting. The default profile answers instantly with
+    # well-formed JSON. With retry=, simulated 429s go through the policy like
+    # OpenAIProvider's; without it they reach the caller.
+    def __init__(self, latency_ms: float = 0.0, profile: Optional[MockProfile] = None, retry: Optional[RetryPolicy] = None):
+        self.profile = profile or MockProfile(latency_ms=latency_ms)
+        self.retry = retry
+        self.__rnd = random.Random(self.profile.seed)
+        self.__lock = threading.Lock()
+        self.__counts: Dict[str, int] = {}
+
     def generate(self, system, user, model, temperature, max_tokens) -> Tuple[str, int, int, int]:
+        if self.retry is not None:
+            return self.retry.run(lambda: self.__generate(system, user, max_tokens))
+        return self.__generate(system, user, max_tokens)
+
+    async def agenerate(self, system, user, model, temperature, max_tokens) -> Tuple[str, int, int, int]:
+        if self.retry is not None:
+            return await self.retry.arun(lambda: self.__agenerate(system, user, max_tokens))
+        return await self.__agenerate(system, user, max_tokens)
+
+    def stream(self, system, user, model, temperature, max_tokens) -> Iterator[str]:
+        if self.retry is not None:
+            self.retry.run(self.__admit)
+        else:
+            self.__admit()
+        text, tokens_out = self.__output(system, user, max_tokens)
+        p = self.profile
+        size = max(1, p.chunk_tokens) * 4
+        chunks = range(0, len(text), size)
+        total = self.__latency() / 1000
+        if p.ttft_ms:
+            time.sleep(p.ttft_ms / 1000)
+        per_chunk = (size / 4) / p.tokens_per_s if p.tokens_per_s else max(0.0, total - p.ttft_ms / 1000) / max(1, len(chunks))
+        for i in chunks:
+            if per_chunk and i:
+                time.sleep(per_chunk)
+            yield text[i:i + size]
+        return self.__tokens_in(system, user), tokens_out
+
+    def stats(self) -> Dict[str, int]:
+        with self.__lock:
+            return dict(self.__counts)
+
+    def __generate(self, system, user, max_tokens) -> Tuple[str, int, int, int]:
+        t0 = time.time()
+        self.__admit()
+        text, tokens_out = self.__output(system, user, max_tokens)
+        delay = self.__latency() / 1000 - (time.time() - t0)
+        if delay > 0:
+            time.sleep(delay)
+        dur = int((time.time() - t0) * 1000)
+        return text, dur, self.__tokens_in(system, user), tokens_out
+
+    async def __agenerate(self, system, user, max_tokens) -> Tuple[str, int, int, int]:
         t0 = time.time()
+        self.__admit()
+        text, tokens_out = self.__output(system, user, max_tokens)
+        delay = self.__latency() / 1000 - (time.time() - t0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        dur = int((time.time() - t0) * 1000)
+        return text, dur, self.__tokens_in(system, user), tokens_out
+
+    def __admit(self):
+        self.__count("calls")
+        if self.profile.rate_limit_rate and self.__draw() < self.profile.rate_limit_rate:
+            self.__count("rate_limited")
+            raise MockRateLimitError(self.profile.retry_after_s)
+
+    def __output(self, system, user, max_tokens) -> Tuple[str, int]:
+        # Model text after any simulated fault, cut at max_tokens like a length stop.
+        text = self.__malform(self.__render(system, user))
+        tokens = count_tokens(text)
+        if max_tokens and tokens > max_tokens:
+            text = text[: len(text) * max_tokens // tokens]
+            tokens = max_tokens
+            self.__count("length_stops")
+        return text, tokens
+
+    def __malform(self, text: str) -> str:
+        p = self.profile
+        u = self.__draw()
+        for fault in FAULTS:
+            rate = getattr(p, fault + "_rate")
+            if u < rate:
+                self.__count(fault)
+                if fault == "fenced":
+                    return "```json\n" + text + "\n```"
+                if fault == "prose":
+                    return "Sure! Here is a recipe you might enjoy:\n" + text + "\nLet me know if you want any substitutions."
+                if fault == "truncated":
+                    return text[: int(len(text) * (0.5 + 0.45 * self.__draw()))]
+                return text.replace("}", ",}").replace("]", ",]")
+            u -= rate
+        return text
+
+    def __latency(self) -> float:
+        p = self.profile
+        if not p.latency_ms:
+            return 0.0
+        with self.__lock:
+            if p.latency == "fixed":
+                ms = p.latency_ms
+            elif p.latency == "uniform":
+                ms = self.__rnd.uniform(0, 2 * p.latency_ms)
+            elif p.latency == "exponential":
+                ms = self.__rnd.expovariate(1 / p.latency_ms)
+            else:
+                ms = self.__rnd.lognormvariate(0, p.latency_sigma) * p.latency_ms
+        return min(ms, p.max_latency_ms)
+
+    def __draw(self) -> float:
+        with self.__lock:
+            return self.__rnd.random()
+
+    def __count(self, name: str, n: int = 1):
+        with self.__lock:
+            self.__counts[name] = self.__counts.get(name, 0) + n
+
+    def __tokens_in(self, system, user) -> int:
+        return count_prompt_tokens(system, user)
+
+    def __render(self, system, user) -> str:
         seed = int(hashlib.sha256(((system or "") + "|" + user).encode()).hexdigest(), 16) % (10**8)
         rnd = random.Random(seed)
         title = "Mock Recipe " + str(abs(seed) % 1000)
@@ -29,6 +207,4 @@ class MockProvider(BaseProvider):
             "ingredients": ingredients,
             "steps": steps
         }
-        text = json.dumps(recipe, ensure_ascii=False)
-        dur = int((time.time() - t0) * 1000)
-        return text, dur, 200, len(text)
+        return _json.dumps(recipe)
@@ -1,47 +1,144 @@
 
-import os, time, json
-from typing import Tuple
+import os, time, asyncio, threading, weakref
+from typing import Tuple, Iterator, Optional, Dict
 from ..provider_base import BaseProvider
-from ..recipe_schema import schema_description
+from .http_pool import PoolConfig, build_http_client, build_async_http_client
+from ..prompt import messages
+from ..tokens import count_tokens
+from ..retry import RetryPolicy, classify_error, CAPABILITY
 
-SYSTEM_GUARD = "You are a culinary assistant. Return ONLY valid JSON matching the requested schema. Do not include markdown or explanations."
+JSON_MODE = {"type": "json_object"}
+
+# Process-wide memory of which (base_url, model) pairs accept response_format.
+_JSON_MODE_SUPPORT: Dict[Tuple[Optional[str], str], bool] = {}
+_JSON_MODE_LOCK = threading.Lock()
+
+def _cached_tokens(usage) -> int:
+    # Prompt tokens served from the provider's prefix cache; 0 when not reported.
+    details = getattr(usage, "prompt_tokens_details", None) if usage else None
+    return (getattr(details, "cached_tokens", 0) or 0) if details else 0
 
 class OpenAIProvider(BaseProvider):
-    def __init__(self):
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None, pool: Optional[PoolConfig] = None, retry: Optional[RetryPolicy] = None):
         from openai import OpenAI
-        api_key = os.getenv("OPENAI_API_KEY")
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise RuntimeError("OPENAI_API_KEY not set in environment")
-        self.__client = OpenAI(api_key=api_key)
+        self.__api_key = api_key
+        self.__base_url = base_url
+        self.__pool = pool or PoolConfig()
+        self.__retry = retry or RetryPolicy()
+        # Retries are handled by RetryPolicy, so the SDK's own retry loop is disabled.
+        self.__client = OpenAI(api_key=api_key, base_url=base_url, http_client=build_http_client(self.__pool), max_retries=0)
+        self.__async_clients = weakref.WeakKeyDictionary()
 
     def generate(self, system, user, model, temperature, max_tokens) -> Tuple[str, int, int, int]:
         t0 = time.time()
-        schema_text = json.dumps(schema_description(), ensure_ascii=False)
-        sys_msg = (system or SYSTEM_GUARD) + "\nSchema:" + schema_text + "\nRules: output JSON ONLY."
+        r = self.__create(self.__client.chat.completions.create, model=model, messages=messages(system, user), temperature=temperature, max_tokens=max_tokens)
+        return self.__unpack(r, t0, model)
+
+    async def agenerate(self, system, user, model, temperature, max_tokens) -> Tuple[str, int, int, int]:
+        t0 = time.time()
+        r = await self.__acreate(self.__get_async_client().chat.completions.create, model=model, messages=messages(system, user), temperature=temperature, max_tokens=max_tokens)
+        return self.__unpack(r, t0, model)
+
+    def stream(self, system, user, model, temperature, max_tokens) -> Iterator[str]:
+        s = self.__create(
+            self.__client.chat.completions.create,
+            model=model, messages=messages(system, user), temperature=temperature, max_tokens=max_tokens,
+            stream=True, stream_options={"include_usage": True},
+        )
+        prompt_tokens, completion_tokens, cached_tokens, parts = 0, 0, 0, []
         try:
-            r = self.__client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": sys_msg},
-                    {"role": "user", "content": user},
-                ],
-                temperature=temperature,
-                max_tokens=max_tokens,
-                response_format={"type":"json_object"}
-            )
-        except Exception:
-            r = self.__client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": sys_msg},
-                    {"role": "user", "content": user},
-                ],
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
+            for chunk in s:
+                usage = getattr(chunk, "usage", None)
+                if usage:
+                    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+                    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+                    cached_tokens = _cached_tokens(usage)
+                if chunk.choices:
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+        finally:
+            # Closing the stream drops the connection, so an early abort stops token generation.
+            s.close()
+        return prompt_tokens, completion_tokens or count_tokens("".join(parts), model), cached_tokens
+
+    def __create(self, create, model, **kwargs):
+        # Transient failures (timeouts, 429, 5xx) go through the retry policy. Only an
+        # error that says response_format is unsupported drops JSON mode, and that
+        # outcome is remembered for the model so later calls skip the failing request.
+        while True:
+            json_mode = self.__json_mode_supported(model)
+            try:
+                r = self.__retry.run(lambda: create(**self.__request(model, json_mode, kwargs)))
+            except Exception as e:
+                if json_mode and self.__mark_capability_error(model, e):
+                    continue
+                raise
+            self.__mark_json_mode(model, json_mode)
+            return r
+
+    async def __acreate(self, create, model, **kwargs):
+        # Async twin of __create; keep the two in step.
+        while True:
+            json_mode = self.__json_mode_supported(model)
+            try:
+                r = await self.__retry.arun(lambda: create(**self.__request(model, json_mode, kwargs)))
+            except Exception as e:
+                if json_mode and self.__mark_capability_error(model, e):
+                    continue
+                raise
+            self.__mark_json_mode(model, json_mode)
+            return r
+
+    def __request(self, model: str, json_mode: bool, kwargs: dict) -> dict:
+        return dict(kwargs, model=model, response_format=JSON_MODE) if json_mode else dict(kwargs, model=model)
+
+    def __json_mode_supported(self, model: str) -> bool:
+        return _JSON_MODE_SUPPORT.get((self.__base_url, model), True)
+
+    def __mark_json_mode(self, model: str, json_mode: bool):
+        if json_mode and (self.__base_url, model) not in _JSON_MODE_SUPPORT:
+            with _JSON_MODE_LOCK:
+                _JSON_MODE_SUPPORT.setdefault((self.__base_url, model), True)
+
+    def __mark_capability_error(self, model: str, exc: BaseException) -> bool:
+        if classify_error(exc) != CAPABILITY:
+            return False
+        with _JSON_MODE_LOCK:
+            _JSON_MODE_SUPPORT[(self.__base_url, model)] = False
+        return True
+
+    def __get_async_client(self):
+        # Async connection pools are bound to the event loop that opened them.
+        loop = asyncio.get_running_loop()
+        client = self.__async_clients.get(loop)
+        if client is None:
+            from openai import AsyncOpenAI
+            client = AsyncOpenAI(api_key=self.__api_key, base_url=self.__base_url, http_client=build_async_http_client(self.__pool), max_retries=0)
+            self.__async_clients[loop] = client
+        return client
+
+    def close(self):
+        self.__client.close()
+        # Each async client belongs to its event loop: closed there if the loop is
+        # running (possibly this one), run to completion on it if it is idle.
+        clients, self.__async_clients = list(self.__async_clients.items()), weakref.WeakKeyDictionary()
+        for loop, client in clients:
+            if loop.is_closed():
+                continue
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(client.close(), loop)
+            else:
+                loop.run_until_complete(client.close())
+
+    def __unpack(self, r, t0, model) -> Tuple[str, int, int, int, int]:
         text = r.choices[0].message.content or ""
         usage = getattr(r, "usage", None)
         prompt_tokens = getattr(usage, "prompt_tokens", 0) if usage else 0
-        completion_tokens = getattr(usage, "completion_tokens", 0) if usage else len(text)
+        completion_tokens = getattr(usage, "completion_tokens", 0) if usage else count_tokens(text, model)
         dur = int((time.time() - t0) * 1000)
-        return text, dur, prompt_tokens, completion_tokens
+        return text, dur, prompt_tokens, completion_tokens, _cached_tokens(usage)
@@ -0,0 +1,359 @@
+
+import asyncio, contextvars, random, threading, time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from .. import _json, usage as _usage
+from ..provider_base import BaseProvider
+from ..json_repair import repair_json_structure
+from ..retry import retry_after_seconds
+from ..tokens import count_prompt_tokens, count_tokens, completion_budget
+from ..validation import is_valid_recipe
+
+@dataclass
+class Backend:
+    # One routing target: a provider, optionally pinned to a model (otherwise the
+    # request's model is passed through). tokens_per_minute is its quota; a backend
+    # without headroom is only used when every backend is out of quota.
+    provider: BaseProvider
+    model: Optional[str] = None
+    name: Optional[str] = None
+    weight: float = 1.0
+    tokens_per_minute: Optional[int] = None
+
+def recipe_passes(text: str) -> bool:
+    # The client's acceptance test: valid recipe JSON as is or after local repair.
+    for candidate in (text, repair_json_structure(text)):
+        if not candidate:
+            continue
+        try:
+            parsed = _json.loads(candidate)
+        except Exception:
+            continue
+        if is_valid_recipe(parsed):
+            return True
+    return False
+
+class _Spend:
+    # Outputs of one routed request. All but the one handed back are billed to the
+    # caller's ledgers as discarded, including sync hedge losers that finish after
+    # the request returned. Cancelled async calls produce no output to bill.
+    def __init__(self, system, user):
+        self.system, self.user = system, user
+        self.ledgers = _usage.ledgers()
+        self.outputs: List[Tuple[str, Tuple]] = []
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def add(self, model: str, out: Tuple):
+        with self.lock:
+            if not self.closed:
+                self.outputs.append((model, out))
+                return
+        self.bill(model, out)
+
+    def close(self, kept: Optional[Tuple]):
+        with self.lock:
+            self.closed = True
+            rest, self.outputs = [(m, o) for m, o in self.outputs if o is not kept], []
+        for model, out in rest:
+            self.bill(model, out)
+
+    def bill(self, model: str, out: Tuple):
+        tokens_in, tokens_out = out[2], out[3]
+        estimated = not tokens_in or not tokens_out
+        tokens_in = tokens_in or count_prompt_tokens(self.system, self.user, model)
+        tokens_out = tokens_out or count_tokens(out[0], model)
+        for ledger in self.ledgers:
+            ledger.record(model, tokens_in, tokens_out, out[4] if len(out) > 4 else 0, estimated, discarded=True)
+
+class _State:
+    def __init__(self, backend: Backend, window: int):
+        self.backend = backend
+        self.name = backend.name or (backend.model or type(backend.provider).__name__)
+        self.latencies = deque(maxlen=window)
+        self.sorted: List[float] = []
+        self.error_rate = 0.0
+        self.calls = self.errors = self.invalid = 0
+        self.in_flight = 0
+        self.hedges = self.hedge_wins = 0
+        self.cooldown_until = 0.0
+        self.quota = float(backend.tokens_per_minute or 0)
+        self.quota_updated = time.monotonic()
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.sorted:
+            return None
+        return self.sorted[min(len(self.sorted) - 1, int(q * len(self.sorted)))]
+
+    def headroom(self, now: float) -> float:
+        tpm = self.backend.tokens_per_minute
+        if not tpm:
+            return float("inf")
+        self.quota = min(float(tpm), self.quota + (now - self.quota_updated) * tpm / 60.0)
+        self.quota_updated = now
+        return self.quota
+
+class RouterProvider(BaseProvider):
+    # Sends each request to the backend with the lowest expected cost: its latency at
+    # rank_percentile times (in-flight calls + 1) (the "peak EWMA" load-balancing rule),
+    # inflated by its recent error rate and divided by its weight. Backends with fewer
+    # than min_samples completions are tried first so every backend gets measured;
+    # backends answering 429 sit out their Retry-After.
+    #
+    # Hedging: when the call in flight has not finished after its backend's
+    # hedge_percentile latency, the next-best backend is called too and the first
+    # result that passes validate wins. Failed or invalid results fall through to the
+    # next backend, up to max_attempts backends per request. Async losers are
+    # cancelled; sync losers finish in the background. Outputs that were generated but
+    # not returned are recorded as discarded usage (see usage.Usage.discarded).
+    name = "router"
+
+    def __init__(
+        self,
+        backends: Sequence[Backend],
+        hedge: bool = True,
+        hedge_percentile: float = 0.95,
+        hedge_min_ms: float = 50.0,
+        rank_percentile: float = 0.5,
+        max_attempts: int = 3,
+        min_samples: int = 5,
+        window: int = 200,
+        error_penalty: float = 4.0,
+        error_decay: float = 0.1,
+        validate: Callable[[str], bool] = recipe_passes,
+        max_workers: int = 64,
+    ):
+        if not backends:
+            raise ValueError("RouterProvider needs at least one backend")
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_ms = hedge_min_ms
+        self.rank_percentile = rank_percentile
+        self.max_attempts = max(1, min(max_attempts, len(backends)))
+        self.min_samples = min_samples
+        self.error_penalty = error_penalty
+        self.error_decay = error_decay
+        self.validate = validate
+        self.__states = [_State(b, window) for b in backends]
+        self.__lock = threading.Lock()
+        self.__pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="router")
+
+    def generate(self, system, user, model, temperature, max_tokens) -> Tuple:
+        t0 = time.time()
+        cost = self.__cost(system, user, model, max_tokens)
+        spend = _Spend(system, user)
+        tried: List[_State] = []
+        pending: Dict[Any, Tuple[_State, float, bool]] = {}
+        failure: Optional[BaseException] = None
+        rejected: Optional[Tuple] = None
+
+        def launch(hedged: bool) -> bool:
+            s = self.__acquire(tried, cost, hedged)
+            if s is None:
+                return False
+            # The caller's context carries its metrics registry into the worker thread.
+            fut = self.__pool.submit(contextvars.copy_context().run, self.__call, s, spend, system, user, model, temperature, max_tokens)
+            pending[fut] = (s, time.monotonic(), hedged)
+            return True
+
+        launch(False)
+        while pending:
+            deadline = self.__hedge_deadline(pending, tried)
+            done, _ = wait(list(pending), timeout=None if deadline is None else max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                if not launch(True):
+                    wait(list(pending), return_when=FIRST_COMPLETED)
+                continue
+            for fut in done:
+                s, _, hedged = pending.pop(fut)
+                try:
+                    out, valid = fut.result()
+                except Exception as e:
+                    failure = e
+                    continue
+                if valid:
+                    return self.__won(s, hedged, out, t0, spend)
+                rejected = out
+            if not pending and len(tried) < self.max_attempts:
+                launch(False)
+        return self.__lost(rejected, failure, t0, spend)
+
+    async def agenerate(self, system, user, model, temperature, max_tokens) -> Tuple:
+        t0 = time.time()
+        cost = self.__cost(system, user, model, max_tokens)
+        spend = _Spend(system, user)
+        tried: List[_State] = []
+        pending: Dict[asyncio.Task, Tuple[_State, float, bool]] = {}
+        failure: Optional[BaseException] = None
+        rejected: Optional[Tuple] = None
+
+        def launch(hedged: bool) -> bool:
+            s = self.__acquire(tried, cost, hedged)
+            if s is None:
+                return False
+            task = asyncio.ensure_future(self.__acall(s, spend, system, user, model, temperature, max_tokens))
+            task.add_done_callback(lambda t, s=s: self.__release(s) if t.cancelled() else None)
+            pending[task] = (s, time.monotonic(), hedged)
+            return True
+
+        launch(False)
+        try:
+            while pending:
+                deadline = self.__hedge_deadline(pending, tried)
+                done, _ = await asyncio.wait(list(pending), timeout=None if deadline is None else max(0.0, deadline - time.monotonic()), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if not launch(True):
+                        await asyncio.wait(list(pending), return_when=asyncio.FIRST_COMPLETED)
+                    continue
+                for task in done:
+                    s, _, hedged = pending.pop(task)
+                    try:
+                        out, valid = task.result()
+                    except Exception as e:
+                        failure = e
+                        continue
+                    if valid:
+                        return self.__won(s, hedged, out, t0, spend)
+                    rejected = out
+                if not pending and len(tried) < self.max_attempts:
+                    launch(False)
+            return self.__lost(rejected, failure, t0, spend)
+        finally:
+            # Cancelling the losing calls closes their connections and stops generation.
+            for task in pending:
+                task.cancel()
+
+    def stream(self, system, user, model, temperature, max_tokens) -> Iterator[str]:
+        # Streams are routed but not hedged: deltas already shown cannot be taken back.
+        s = self.__acquire([], self.__cost(system, user, model, max_tokens), False)
+        t = time.perf_counter()
+        try:
+            usage = yield from s.backend.provider.stream(system, user, s.backend.model or model, temperature, max_tokens)
+        except Exception as e:
+            self.__record(s, None, False, e)
+            raise
+        except BaseException:
+            # Closed early by the consumer (GeneratorExit) or interrupted: free the
+            # slot without counting an outcome, like a cancelled async call.
+            self.__release(s)
+            raise
+        self.__record(s, (time.perf_counter() - t) * 1000, True)
+        return usage
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self.__lock:
+            return [
+                {
+                    "name": s.name, "calls": s.calls, "errors": s.errors, "invalid": s.invalid,
+                    "error_rate": round(s.error_rate, 4), "in_flight": s.in_flight,
+                    "p50_ms": s.percentile(0.5), "p95_ms": s.percentile(0.95), "p99_ms": s.percentile(0.99),
+                    "hedges": s.hedges, "hedge_wins": s.hedge_wins,
+                    "cooling_down": s.cooldown_until > time.monotonic(),
+                }
+                for s in self.__states
+            ]
+
+    def close(self):
+        self.__pool.shutdown(wait=False, cancel_futures=True)
+
+    def __cost(self, system, user, model, max_tokens) -> int:
+        return count_prompt_tokens(system, user, model) + (max_tokens if max_tokens is not None else completion_budget(user, model))
+
+    def __score(self, s: _State, now: float) -> Tuple:
+        # Sort key: (cooling down, unmeasured first, expected cost, random tie-break).
+        lat = s.percentile(self.rank_percentile)
+        measured = len(s.latencies) >= self.min_samples and lat is not None
+        cost = (lat if measured else 0.0) * (s.in_flight + 1) * (1 + self.error_penalty * s.error_rate) / max(s.backend.weight, 1e-9)
+        return (s.cooldown_until > now, measured, s.in_flight if not measured else 0, cost, random.random())
+
+    def __acquire(self, tried: List[_State], tokens: int, hedged: bool) -> Optional[_State]:
+        now = time.monotonic()
+        with self.__lock:
+            candidates = [s for s in self.__states if s not in tried]
+            if not candidates or len(tried) >= self.max_attempts:
+                return None
+            with_quota = [s for s in candidates if s.headroom(now) >= tokens]
+            s = min(with_quota or candidates, key=lambda c: self.__score(c, now))
+            if s.backend.tokens_per_minute:
+                s.quota -= tokens
+            s.in_flight += 1
+            if hedged:
+                s.hedges += 1
+            tried.append(s)
+            return s
+
+    def __hedge_deadline(self, pending: Dict, tried: List[_State]) -> Optional[float]:
+        # Monotonic time at which to hedge the single call in flight, if hedging applies.
+        if not self.hedge or len(pending) != 1 or len(tried) >= self.max_attempts:
+            return None
+        s, started, _ = next(iter(pending.values()))
+        with self.__lock:
+            p = s.percentile(self.hedge_percentile) if len(s.latencies) >= self.min_samples else None
+        if p is None:
+            return None
+        return started + max(p, self.hedge_min_ms) / 1000
+
+    def __call(self, s: _State, spend: _Spend, system, user, model, temperature, max_tokens) -> Tuple[Tuple, bool]:
+        t = time.perf_counter()
+        try:
+            out = s.backend.provider.generate(system, user, s.backend.model or model, temperature, max_tokens)
+        except Exception as e:
+            self.__record(s, None, False, e)
+            raise
+        spend.add(s.backend.model or model, out)
+        valid = self.validate(out[0])
+        self.__record(s, (time.perf_counter() - t) * 1000, valid)
+        return out, valid
+
+    async def __acall(self, s: _State, spend: _Spend, system, user, model, temperature, max_tokens) -> Tuple[Tuple, bool]:
+        t = time.perf_counter()
+        try:
+            out = await s.backend.provider.agenerate(system, user, s.backend.model or model, temperature, max_tokens)
+        except Exception as e:
+            self.__record(s, None, False, e)
+            raise
+        spend.add(s.backend.model or model, out)
+        valid = self.validate(out[0])
+        self.__record(s, (time.perf_counter() - t) * 1000, valid)
+        return out, valid
+
+    def __release(self, s: _State):
+        # A cancelled call: frees its slot without counting as an outcome.
+        with self.__lock:
+            s.in_flight -= 1
+
+    def __record(self, s: _State, ms: Optional[float], valid: bool, error: Optional[BaseException] = None):
+        with self.__lock:
+            s.in_flight -= 1
+            s.calls += 1
+            failed = error is not None or not valid
+            s.error_rate += self.error_decay * ((1.0 if failed else 0.0) - s.error_rate)
+            if error is not None:
+                s.errors += 1
+                status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+                if status == 429:
+                    s.cooldown_until = time.monotonic() + (retry_after_seconds(error) or 1.0)
+            elif not valid:
+                s.invalid += 1
+            if ms is not None:
+                s.latencies.append(ms)
+                s.sorted = sorted(s.latencies)
+
+    def __won(self, s: _State, hedged: bool, out: Tuple, t0: float, spend: _Spend) -> Tuple:
+        spend.close(out)
+        if hedged:
+            with self.__lock:
+                s.hedge_wins += 1
+        return (out[0], int((time.time() - t0) * 1000)) + tuple(out[2:])
+
+    def __lost(self, rejected: Optional[Tuple], failure: Optional[BaseException], t0: float, spend: _Spend) -> Tuple:
+        # No backend produced a passing result: hand back the last output so the client
+        # reports its parse/schema error, or re-raise the last provider error.
+        spend.close(rejected)
+        if rejected is not None:
+            return (rejected[0], int((time.time() - t0) * 1000)) + tuple(rejected[2:])
+        if failure is not None:
+            raise failure
+        raise RuntimeError("no backend available")
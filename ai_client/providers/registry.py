@@ -0,0 +1,72 @@
+import os, hashlib, threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from ..provider_base import BaseProvider
+from .http_pool import PoolConfig
+from ..retry import RetryPolicy
+
+_PROVIDERS: Dict[Tuple, BaseProvider] = {}
+_LOCK = threading.Lock()
+
+# name -> (factory, models, api_key_env). A factory is called as
+# factory(api_key=..., base_url=..., pool=..., retry=...) and may ignore what it
+# does not use.
+_FACTORIES: Dict[str, Tuple[Callable[..., BaseProvider], List[str], Optional[str]]] = {}
+
+def register_provider(name: str, factory: Callable[..., BaseProvider], models: Sequence[str] = (), api_key_env: Optional[str] = None, replace: bool = False):
+    with _LOCK:
+        if name in _FACTORIES and not replace:
+            raise ValueError(f"provider already registered: {name}")
+        _FACTORIES[name] = (factory, list(models), api_key_env)
+
+def provider_names() -> List[str]:
+    return list(_FACTORIES)
+
+def provider_models(name: str) -> List[str]:
+    entry = _FACTORIES.get(name)
+    return list(entry[1]) if entry is not None else []
+
+def _credential_fingerprint(api_key: Optional[str]) -> str:
+    # Keyed by a digest so raw credentials never sit in the registry keys.
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+def get_provider(name: str, api_key: Optional[str] = None, base_url: Optional[str] = None, pool: Optional[PoolConfig] = None, retry: Optional[RetryPolicy] = None) -> BaseProvider:
+    # Process-wide provider instances, so every AIClient for the same backend and
+    # credentials reuses one keep-alive connection pool.
+    pool = pool or PoolConfig()
+    retry = retry or RetryPolicy()
+    entry = _FACTORIES.get(name)
+    if entry is None:
+        raise ValueError("unknown provider")
+    factory, _, api_key_env = entry
+    if api_key_env:
+        api_key = api_key or os.getenv(api_key_env)
+    key = (name, _credential_fingerprint(api_key), base_url, pool, retry)
+    provider = _PROVIDERS.get(key)
+    if provider is not None:
+        return provider
+    with _LOCK:
+        provider = _PROVIDERS.get(key)
+        if provider is None:
+            provider = factory(api_key=api_key, base_url=base_url, pool=pool, retry=retry)
+            _PROVIDERS[key] = provider
+    return provider
+
+def _mock(api_key, base_url, pool, retry) -> BaseProvider:
+    from .provider_mock import MockProvider, MockProfile
+    return MockProvider(profile=MockProfile.from_env(), retry=retry)
+
+def _openai(api_key, base_url, pool, retry) -> BaseProvider:
+    from .provider_openai import OpenAIProvider
+    return OpenAIProvider(api_key=api_key, base_url=base_url, pool=pool, retry=retry)
+
+register_provider("mock", _mock, models=["mock-1"])
+register_provider("openai", _openai, models=["gpt-4o-mini", "gpt-4o"], api_key_env="OPENAI_API_KEY")
+
+def clear_providers():
+    with _LOCK:
+        providers = list(_PROVIDERS.values())
+        _PROVIDERS.clear()
+    for p in providers:
+        close = getattr(p, "close", None)
+        if close is not None:
+            close()
@@ -0,0 +1,63 @@
+
+import zlib
+from typing import Any, Dict, Union
+from . import _json
+
+# Stored recipe formats. Legacy rows hold the JSON as TEXT; every other format is a
+# BLOB whose first byte names the encoding, so a store can switch codecs without
+# rewriting existing rows and readers can always decode what they find.
+TEXT = "text"
+ZLIB = "zlib"
+ZSTD = "zstd"
+CODECS = (TEXT, ZLIB, ZSTD)
+
+_ZLIB_V1 = 1
+_ZSTD_V1 = 2
+
+# Preset dictionary for zlib: recipes are a few KB at most, too short for zlib to
+# learn the repeated key names on its own. Rows written with _ZLIB_V1 depend on these
+# exact bytes, so changes need a new version byte.
+_ZDICT = (
+    b'"notes":null}"unit":"g","notes":"quantity":"name":"usage":null}]"equipment":[{"name":'
+    b'"duration_min":null"instruction":"Add the"number":"steps":[{"unit":"tsp"'
+    b'"unit":"tbsp"cup"unit":null"ingredients":[{"name":"total_min":"cook_min":'
+    b'"prep_min":"time":{"difficulty":"easy"medium"hard"servings":{"title":"'
+)
+_ZLIB_LEVEL = 6
+_ZSTD_LEVEL = 6
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("the zstd codec requires the 'zstandard' package")
+    return zstandard
+
+def encode_recipe(recipe: Dict[str, Any], codec: str = TEXT) -> Union[str, bytes]:
+    text = _json.dumps(recipe)
+    if codec == TEXT:
+        return text
+    raw = text.encode("utf-8")
+    if codec == ZLIB:
+        c = zlib.compressobj(_ZLIB_LEVEL, zdict=_ZDICT)
+        return bytes([_ZLIB_V1]) + c.compress(raw) + c.flush()
+    if codec == ZSTD:
+        return bytes([_ZSTD_V1]) + _zstd().ZstdCompressor(level=_ZSTD_LEVEL).compress(raw)
+    raise ValueError(f"unknown codec: {codec}")
+
+def decode_json_text(value: Union[str, bytes]) -> str:
+    # The stored JSON document as text, whatever format the row was written in.
+    if isinstance(value, str):
+        return value
+    version, payload = value[0], memoryview(value)[1:]
+    if version == _ZLIB_V1:
+        d = zlib.decompressobj(zdict=_ZDICT)
+        raw = d.decompress(payload) + d.flush()
+    elif version == _ZSTD_V1:
+        raw = _zstd().ZstdDecompressor().decompress(payload)
+    else:
+        raise ValueError(f"unknown recipe format version: {version}")
+    return raw.decode("utf-8")
+
+def decode_recipe(value: Union[str, bytes]) -> Any:
+    return _json.loads(decode_json_text(value))
@@ -8,6 +8,14 @@ RECIPE_SCHEMA_KEYS = [
     "steps"
 ]
 
+# Fields that may be left out of a recipe. Fields typed "...|null" are always optional.
+OPTIONAL_FIELDS = [
+    "steps[].equipment"
+]
+
+# Bump whenever schema_description() changes so memoized prompt text is rebuilt.
+SCHEMA_VERSION = 1
+
 def schema_description():
     return {
         "title": "str",
@@ -0,0 +1,105 @@
+
+import asyncio, random, time, email.utils
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+from . import metrics
+
+T = TypeVar("T")
+
+RETRYABLE = "retryable"
+CAPABILITY = "capability"
+FATAL = "fatal"
+
+_RETRYABLE_STATUS = {408, 409, 425, 429}
+_RETRYABLE_NAMES = {"APITimeoutError", "APIConnectionError", "TimeoutException", "ConnectError", "ReadTimeout", "RemoteProtocolError"}
+# Only errors about JSON mode itself; a 400 about some other unsupported parameter
+# (temperature, max_tokens, ...) must not turn JSON mode off for the model.
+_CAPABILITY_HINTS = ("response_format", "json_object", "json mode")
+
+def _status(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+def classify_error(exc: BaseException) -> str:
+    status = _status(exc)
+    if status is not None:
+        if status in _RETRYABLE_STATUS or status >= 500:
+            return RETRYABLE
+        if status in (400, 422):
+            param = getattr(exc, "param", None)
+            if param == "response_format" or (param is None and any(h in str(exc).lower() for h in _CAPABILITY_HINTS)):
+                return CAPABILITY
+        return FATAL
+    if isinstance(exc, (TimeoutError, ConnectionError)) or type(exc).__name__ in _RETRYABLE_NAMES:
+        return RETRYABLE
+    return FATAL
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 20.0
+    max_retry_after: float = 60.0
+
+    def delay(self, attempt: int, exc: Optional[BaseException] = None) -> float:
+        # Server-provided Retry-After wins; otherwise exponential backoff with full jitter.
+        hinted = retry_after_seconds(exc) if exc is not None else None
+        if hinted is not None:
+            return min(hinted, self.max_retry_after)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def should_retry(self, attempt: int, exc: BaseException) -> bool:
+        return attempt + 1 < self.max_attempts and classify_error(exc) == RETRYABLE
+
+    def run(self, fn: Callable[[], T], on_retry: Optional[Callable[[int, BaseException], Any]] = None) -> T:
+        attempt = 0
+        while True:
+            try:
+                return fn()
+            except Exception as e:
+                if not self.should_retry(attempt, e):
+                    raise
+                metrics.current().incr(metrics.RETRY)
+                if on_retry is not None:
+                    on_retry(attempt, e)
+                time.sleep(self.delay(attempt, e))
+                attempt += 1
+
+    async def arun(self, fn: Callable[[], Awaitable[T]], on_retry: Optional[Callable[[int, BaseException], Any]] = None) -> T:
+        attempt = 0
+        while True:
+            try:
+                return await fn()
+            except Exception as e:
+                if not self.should_retry(attempt, e):
+                    raise
+                metrics.current().incr(metrics.RETRY)
+                if on_retry is not None:
+                    on_retry(attempt, e)
+                await asyncio.sleep(self.delay(attempt, e))
+                attempt += 1
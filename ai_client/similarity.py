@@ -0,0 +1,96 @@
+
+import re, zlib
+from typing import Any, Dict, List, Sequence
+
+# MinHash signatures over a recipe's title words and ingredient names, banded for
+# locality-sensitive hashing: two recipes share a bucket in some band with
+# probability 1 - (1 - J**ROWS)**BANDS for Jaccard similarity J (about 0.5 at the
+# knee for 16x4). Stored signatures depend on these constants and the seed, so
+# changing any of them requires rebuild_similarity_index().
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+_SEED = 0x5EED
+_PRIME = (1 << 31) - 1
+_WORD = re.compile(r"\w+", re.UNICODE)
+_PARAMS = None
+
+def _np():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("recipe similarity requires the 'numpy' package")
+    return numpy
+
+def available() -> bool:
+    try:
+        _np()
+        return True
+    except RuntimeError:
+        return False
+
+def _params():
+    global _PARAMS
+    if _PARAMS is None:
+        np = _np()
+        rng = np.random.default_rng(_SEED)
+        a = rng.integers(1, _PRIME, size=NUM_PERM, dtype=np.uint64)
+        b = rng.integers(0, _PRIME, size=NUM_PERM, dtype=np.uint64)
+        mix = rng.integers(1, 1 << 62, size=ROWS, dtype=np.uint64) | np.uint64(1)
+        _PARAMS = (a[:, None], b[:, None], mix)
+    return _PARAMS
+
+def features(recipe: Any) -> List[str]:
+    if not isinstance(recipe, dict):
+        return []
+    out = set()
+    title = recipe.get("title")
+    if isinstance(title, str):
+        out.update("t:" + w for w in _WORD.findall(title.lower()))
+    items = recipe.get("ingredients")
+    for ing in items if isinstance(items, list) else ():
+        name = ing.get("name") if isinstance(ing, dict) else None
+        if isinstance(name, str) and name.strip():
+            out.add("i:" + " ".join(name.lower().split()))
+    return sorted(out)
+
+def signatures(recipes: Sequence[Any]):
+    # (len(recipes), NUM_PERM) uint32 matrix. Rows of recipes with no features are
+    # all _PRIME (see nonempty()) and should not be bucketed.
+    np = _np()
+    a, b, _ = _params()
+    out = np.full((len(recipes), NUM_PERM), _PRIME, dtype=np.uint32)
+    for i, recipe in enumerate(recipes):
+        feats = features(recipe)
+        if feats:
+            x = np.fromiter((zlib.crc32(f.encode("utf-8")) & _PRIME for f in feats), dtype=np.uint64, count=len(feats))
+            out[i] = ((a * x[None, :] + b) % np.uint64(_PRIME)).min(axis=1)
+    return out
+
+def nonempty(sigs):
+    # Per-row flag: False where the recipe had no features to hash.
+    return (sigs != _PRIME).any(axis=1)
+
+def band_keys(sigs):
+    # (n, BANDS) int64 bucket keys; one mixed 63-bit hash per band of ROWS values.
+    np = _np()
+    _, _, mix = _params()
+    bands = sigs.astype(np.uint64).reshape(len(sigs), BANDS, ROWS)
+    with np.errstate(over="ignore"):
+        keys = (bands * mix).sum(axis=2, dtype=np.uint64)
+    return (keys & np.uint64((1 << 63) - 1)).astype(np.int64)
+
+def similarity(sig, sigs):
+    # Estimated Jaccard similarity of sig against each row of sigs.
+    return (sigs == sig).mean(axis=1)
+
+def to_blob(sig) -> bytes:
+    return sig.astype("<u4").tobytes()
+
+def from_blobs(blobs: Sequence[bytes]):
+    np = _np()
+    return np.frombuffer(b"".join(blobs), dtype="<u4").reshape(len(blobs), NUM_PERM)
+
+def estimate(recipe_a: Dict[str, Any], recipe_b: Dict[str, Any]) -> float:
+    sigs = signatures([recipe_a, recipe_b])
+    return float(similarity(sigs[0], sigs[1:])[0])
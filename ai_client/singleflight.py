@@ -0,0 +1,78 @@
+
+import asyncio, threading, weakref
+from typing import Any, Awaitable, Callable, Dict, Tuple, TypeVar
+
+T = TypeVar("T")
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    # Runs at most one call per key at a time. Callers arriving while a call for the
+    # same key is in flight wait for it and share its result or exception. Threaded
+    # callers (do) and async callers (ado) are tracked separately; async calls are
+    # grouped per event loop.
+    def __init__(self):
+        self.__calls: Dict[str, _Call] = {}
+        self.__lock = threading.Lock()
+        self.__tasks = weakref.WeakKeyDictionary()
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key: str, fn: Callable[[], T]) -> Tuple[T, bool]:
+        # Returns (result, shared); shared is True for callers that joined a call.
+        with self.__lock:
+            call = self.__calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.__calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.followers += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.__lock:
+                del self.__calls[key]
+            call.done.set()
+        return call.result, False
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        # The shared call runs as its own task, so a cancelled caller does not cancel
+        # it for the others.
+        loop = asyncio.get_running_loop()
+        with self.__lock:
+            tasks = self.__tasks.setdefault(loop, {})
+        task = tasks.get(key)
+        shared = task is not None
+        if not shared:
+            task = tasks[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda t: tasks.pop(key, None) if tasks.get(key) is t else None)
+        with self.__lock:
+            if shared:
+                self.followers += 1
+            else:
+                self.leaders += 1
+        return await asyncio.shield(task), shared
+
+    def stats(self) -> Dict[str, Any]:
+        return {"leaders": self.leaders, "followers": self.followers, "in_flight": len(self.__calls)}
+
+_DEFAULT = SingleFlight()
+
+def default_group() -> SingleFlight:
+    # Process-wide group shared by every AIClient created with coalesce=True.
+    return _DEFAULT
@@ -1,7 +1,12 @@
 
 from __future__ import annotations
-import os, sqlite3, uuid, json, datetime
-from typing import Optional, List, Dict, Any, Tuple
+import os, re, sqlite3, uuid, datetime, threading, hashlib, base64, functools, weakref
+from collections import namedtuple
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Optional, List, Dict, Any, Tuple, Iterable, Sequence
+from . import similarity, _json
+from .recipe_codec import CODECS, TEXT, ZSTD, encode_recipe, decode_json_text, decode_recipe, _zstd
 
 INIT_SQL = """
 CREATE TABLE IF NOT EXISTS recipes (
@@ -15,31 +20,484 @@ CREATE TABLE IF NOT EXISTS recipes (
   time_total_min INTEGER,
   json TEXT NOT NULL,
   created_at TIMESTAMP NOT NULL,
-  updated_at TIMESTAMP NOT NULL
+  updated_at TIMESTAMP NOT NULL,
+  content_hash TEXT
 );
 CREATE INDEX IF NOT EXISTS idx_recipes_user_title ON recipes (user_id, title);
 """.strip()
 
+# Columns added after the first release; existing databases get them via ALTER TABLE.
+MIGRATION_COLUMNS = [
+    ("content_hash", "TEXT"),
+]
+
+POST_MIGRATION_SQL = """
+CREATE INDEX IF NOT EXISTS idx_recipes_content_hash ON recipes (content_hash);
+DROP INDEX IF EXISTS idx_recipes_created;
+DROP INDEX IF EXISTS idx_recipes_user_created;
+CREATE INDEX IF NOT EXISTS idx_recipes_created_cover ON recipes (created_at, id, user_id, title);
+CREATE INDEX IF NOT EXISTS idx_recipes_user_created_cover ON recipes (user_id, created_at, id, title);
+CREATE INDEX IF NOT EXISTS idx_recipes_difficulty_times ON recipes (difficulty, servings, time_prep_min, time_cook_min, time_total_min);
+""".strip()
+
+RECIPE_COLUMNS = (
+    "id", "user_id", "title", "servings", "difficulty", "time_prep_min", "time_cook_min",
+    "time_total_min", "json", "created_at", "updated_at", "content_hash",
+)
+SimilarRecipe = namedtuple("SimilarRecipe", ("id", "title", "similarity"))
+
+# What the browse views show. These columns are all in the covering listing indexes,
+# so list(fields=SUMMARY_FIELDS) never reads the table rows or their JSON pages.
+SUMMARY_FIELDS = ("id", "title", "created_at")
+
+INSERT_SQL = (
+    "INSERT INTO recipes (id, user_id, title, servings, difficulty, time_prep_min, time_cook_min, time_total_min, json, created_at, updated_at, content_hash) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+# Normalized copies of each recipe's ingredients, steps and step equipment, so
+# analytics can filter and aggregate in SQL instead of decoding every document.
+# Rows are written by save/save_many and removed with their recipe by trigger.
+CHILD_SQL = """
+CREATE TABLE IF NOT EXISTS recipe_ingredients (
+  recipe_id TEXT NOT NULL,
+  position INTEGER NOT NULL,
+  name TEXT,
+  name_norm TEXT,
+  quantity REAL,
+  unit TEXT,
+  notes TEXT,
+  PRIMARY KEY (recipe_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_name ON recipe_ingredients (name_norm, recipe_id);
+CREATE TABLE IF NOT EXISTS recipe_steps (
+  recipe_id TEXT NOT NULL,
+  position INTEGER NOT NULL,
+  number INTEGER,
+  instruction TEXT,
+  duration_min INTEGER,
+  notes TEXT,
+  PRIMARY KEY (recipe_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS recipe_equipment (
+  recipe_id TEXT NOT NULL,
+  step_position INTEGER NOT NULL,
+  position INTEGER NOT NULL,
+  name TEXT,
+  name_norm TEXT,
+  usage TEXT,
+  PRIMARY KEY (recipe_id, step_position, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_recipe_equipment_name ON recipe_equipment (name_norm, recipe_id);
+CREATE TRIGGER IF NOT EXISTS recipes_children_ad AFTER DELETE ON recipes BEGIN
+  DELETE FROM recipe_ingredients WHERE recipe_id = old.id;
+  DELETE FROM recipe_steps WHERE recipe_id = old.id;
+  DELETE FROM recipe_equipment WHERE recipe_id = old.id;
+END;
+""".strip()
+
+CHILD_INSERT_SQL = (
+    "INSERT OR REPLACE INTO recipe_ingredients (recipe_id, position, name, name_norm, quantity, unit, notes) VALUES (?, ?, ?, ?, ?, ?, ?)",
+    "INSERT OR REPLACE INTO recipe_steps (recipe_id, position, number, instruction, duration_min, notes) VALUES (?, ?, ?, ?, ?, ?)",
+    "INSERT OR REPLACE INTO recipe_equipment (recipe_id, step_position, position, name, name_norm, usage) VALUES (?, ?, ?, ?, ?, ?)",
+)
+
+# MinHash signatures (see similarity.py) and their LSH band buckets. Recipes without
+# any features get a signature row but no buckets.
+SIMILARITY_SQL = """
+CREATE TABLE IF NOT EXISTS recipe_signatures (
+  recipe_id TEXT PRIMARY KEY,
+  sig BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS recipe_lsh (
+  band INTEGER NOT NULL,
+  bucket INTEGER NOT NULL,
+  recipe_id TEXT NOT NULL,
+  PRIMARY KEY (band, bucket, recipe_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_recipe_lsh_recipe ON recipe_lsh (recipe_id);
+CREATE TRIGGER IF NOT EXISTS recipes_similarity_ad AFTER DELETE ON recipes BEGIN
+  DELETE FROM recipe_lsh WHERE recipe_id = old.id;
+  DELETE FROM recipe_signatures WHERE recipe_id = old.id;
+END;
+""".strip()
+
+# Joined from a VALUES list so each (band, bucket) pair is a primary-key seek; the
+# equivalent row-value IN (...) makes SQLite scan the whole table.
+_LSH_CANDIDATES_SQL = (
+    "SELECT DISTINCT l.recipe_id FROM (VALUES " + ", ".join(["(?, ?)"] * similarity.BANDS) + ") v "
+    "JOIN recipe_lsh l ON l.band = v.column1 AND l.bucket = v.column2"
+)
+
+# Full-text index over title, ingredient names and step instructions. The FTS rowid
+# mirrors recipes.rowid; rebuild_search_index() re-derives it if the two drift
+# (for example after a VACUUM renumbers rowids). The triggers only index TEXT rows;
+# compressed (BLOB) rows are indexed from Python, which can decode them.
+_FTS_TEXT_COLUMNS = """
+  new.title,
+  (SELECT group_concat(json_extract(value, '$.name'), ' ') FROM json_each(CASE WHEN json_valid(new.json) THEN new.json ELSE '{}' END, '$.ingredients') WHERE type = 'object'),
+  (SELECT group_concat(json_extract(value, '$.instruction'), ' ') FROM json_each(CASE WHEN json_valid(new.json) THEN new.json ELSE '{}' END, '$.steps') WHERE type = 'object')
+"""
+
+FTS_SQL = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(title, ingredients, steps, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3');
+DROP TRIGGER IF EXISTS recipes_fts_ai;
+DROP TRIGGER IF EXISTS recipes_fts_au;
+CREATE TRIGGER recipes_fts_ai AFTER INSERT ON recipes WHEN typeof(new.json) = 'text' BEGIN
+  INSERT INTO recipes_fts (rowid, title, ingredients, steps) VALUES (new.rowid, {_FTS_TEXT_COLUMNS});
+END;
+CREATE TRIGGER IF NOT EXISTS recipes_fts_ad AFTER DELETE ON recipes BEGIN
+  DELETE FROM recipes_fts WHERE rowid = old.rowid;
+END;
+CREATE TRIGGER recipes_fts_au AFTER UPDATE OF title, json ON recipes BEGIN
+  DELETE FROM recipes_fts WHERE rowid = old.rowid;
+  INSERT INTO recipes_fts (rowid, title, ingredients, steps) SELECT new.rowid, {_FTS_TEXT_COLUMNS} WHERE typeof(new.json) = 'text';
+END;
+""".strip()
+
+FTS_BACKFILL_SQL = "INSERT INTO recipes_fts (rowid, title, ingredients, steps) SELECT new.rowid, " + _FTS_TEXT_COLUMNS + " FROM recipes AS new WHERE typeof(new.json) = 'text'"
+FTS_INSERT_SQL = "INSERT INTO recipes_fts (rowid, title, ingredients, steps) VALUES ((SELECT rowid FROM recipes WHERE id = ?), ?, ?, ?)"
+
+_FTS_SOURCE = "recipes_fts JOIN recipes r ON r.rowid = recipes_fts.rowid"
+# bm25 weights for (title, ingredients, steps).
+_FTS_RANK = "bm25(recipes_fts, 10.0, 4.0, 1.0)"
+_FTS_TERM = re.compile(r"\w+", re.UNICODE)
+
+# Keeps IN (...) lookups under SQLite's default host-parameter limit.
+_LOOKUP_CHUNK = 500
+
+# Applied to every pooled connection. WAL lets readers run alongside a writer;
+# synchronous=NORMAL is durable across application crashes under WAL.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+)
+
+_LAZY_COLUMNS = ", ".join(c for c in RECIPE_COLUMNS if c != "json")
+
+# Stored in PRAGMA user_version once INIT_SQL and the migrations have run; bump it
+# when either changes so existing files are migrated on their next open.
+SCHEMA_VERSION = 1
+_INIT_LOCK = threading.Lock()
+
+class _ConnectionHolder:
+    # Held only by the owning thread's threading.local, so it is collected when the
+    # thread exits; a weakref.finalize on it then closes the connection.
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+def _release_connection(conns: set, lock: threading.Lock, conn: sqlite3.Connection):
+    with lock:
+        conns.discard(conn)
+    conn.close()
+
+@dataclass
+class Page:
+    items: List[Any]
+    next_cursor: Optional[str]
+
+@functools.lru_cache(maxsize=None)
+def summary_type(fields: Tuple[str, ...]):
+    return namedtuple("RecipeSummary", fields)
+
+def _projection(fields: Sequence[str]) -> Tuple[Tuple[str, ...], str]:
+    # Requested columns first, then the ordering keys if they were left out.
+    fields = tuple(fields)
+    unknown = [f for f in fields if f not in RECIPE_COLUMNS]
+    if unknown or not fields:
+        raise ValueError(f"unknown fields: {unknown}" if unknown else "fields must not be empty")
+    cols = fields + tuple(k for k in ("created_at", "id") if k not in fields)
+    return fields, ", ".join("r." + c for c in cols)
+
+def encode_cursor(row: Any) -> str:
+    # Opaque keyset position for the (created_at DESC, id DESC) ordering.
+    if isinstance(row, tuple) and hasattr(row, "_fields"):
+        row = row._asdict()
+    raw = _json.dumps([row["created_at"], row["id"]]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def _decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        created_at, rid = _json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(created_at), str(rid)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+def _fts_join(items: Any, key: str) -> Optional[str]:
+    # Mirrors group_concat(json_extract(value, '$.<key>'), ' ') in _FTS_TEXT_COLUMNS.
+    if not isinstance(items, list):
+        return None
+    vals = [it.get(key) for it in items if isinstance(it, dict)]
+    vals = [v if isinstance(v, str) else _json.dumps(v) for v in vals if v is not None]
+    return " ".join(vals) if vals else None
+
+def _text(v: Any) -> Optional[str]:
+    return v if isinstance(v, str) else None
+
+def _int(v: Any) -> Optional[int]:
+    return v if isinstance(v, int) and not isinstance(v, bool) else None
+
+def _number(v: Any) -> Optional[float]:
+    return float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else None
+
+def _norm(v: Any) -> Optional[str]:
+    return " ".join(v.lower().split()) if isinstance(v, str) else None
+
+def _child_rows(rid: str, recipe: Any) -> Tuple[List[tuple], List[tuple], List[tuple]]:
+    # Tolerates partially valid documents: non-object items are skipped and
+    # mistyped values are stored as NULL.
+    ingredients, steps, equipment = [], [], []
+    recipe = recipe if isinstance(recipe, dict) else {}
+    items = recipe.get("ingredients")
+    for i, ing in enumerate(items if isinstance(items, list) else ()):
+        if isinstance(ing, dict):
+            name = ing.get("name")
+            ingredients.append((rid, i, _text(name), _norm(name), _number(ing.get("quantity")), _text(ing.get("unit")), _text(ing.get("notes"))))
+    items = recipe.get("steps")
+    for i, st in enumerate(items if isinstance(items, list) else ()):
+        if not isinstance(st, dict):
+            continue
+        steps.append((rid, i, _int(st.get("number")), _text(st.get("instruction")), _int(st.get("duration_min")), _text(st.get("notes"))))
+        equip = st.get("equipment")
+        for j, eq in enumerate(equip if isinstance(equip, list) else ()):
+            if isinstance(eq, dict):
+                name = eq.get("name")
+                equipment.append((rid, i, j, _text(name), _norm(name), _text(eq.get("usage"))))
+    return ingredients, steps, equipment
+
+def _decoded(row: sqlite3.Row) -> Dict[str, Any]:
+    d = dict(row)
+    if isinstance(d.get("json"), bytes):
+        d["json"] = decode_json_text(d["json"])
+    return d
+
+class LazyRecipe(Mapping):
+    # A stored recipe whose table columns (id, title, servings, difficulty,
+    # time_*_min, created_at, ...) are attributes read straight from the row. Mapping
+    # access (recipe["steps"]) fetches and decodes the JSON document on first use.
+    __slots__ = ("_columns", "_store", "_data")
+
+    def __init__(self, store: "SQLiteRecipeStore", columns: Dict[str, Any]):
+        self._columns = columns
+        self._store = store
+        self._data = None
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self._columns[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def _load(self) -> Dict[str, Any]:
+        if self._data is None:
+            with self._store._connect() as con:
+                row = con.execute("SELECT json FROM recipes WHERE id=?", (self._columns["id"],)).fetchone()
+            if row is None:
+                raise KeyError(self._columns["id"])
+            self._data = decode_recipe(row[0])
+        return self._data
+
+    def __getitem__(self, key: str) -> Any:
+        return self._load()[key]
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self._load())
+
+    def __repr__(self) -> str:
+        return f"LazyRecipe(id={self._columns['id']!r}, title={self._columns['title']!r})"
+
 class RecipeStore:
-    def save(self, recipe: Dict[str, Any], user_id: Optional[str] = None) -> str: ...
+    def save(self, recipe: Dict[str, Any], user_id: Optional[str] = None, dedupe: Optional[float] = None) -> str: ...
+    def save_many(self, recipes: Iterable[Dict[str, Any]], user_id: Optional[str] = None, batch_size: int = 500, upsert: bool = False, dedupe: Optional[float] = None) -> List[str]: ...
     def get(self, recipe_id: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]: ...
-    def list(self, user_id: Optional[str] = None, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]: ...
-    def search(self, q: str, user_id: Optional[str] = None, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]: ...
+    def list(self, user_id: Optional[str] = None, limit: int = 50, offset: int = 0, after: Optional[str] = None, fields: Optional[Sequence[str]] = None) -> List[Any]: ...
+    def search(self, q: str, user_id: Optional[str] = None, limit: int = 50, offset: int = 0, after: Optional[str] = None, order: str = "rank", fields: Optional[Sequence[str]] = None) -> List[Any]: ...
     def delete(self, recipe_id: str, user_id: Optional[str] = None) -> bool: ...
 
 class SQLiteRecipeStore(RecipeStore):
-    def __init__(self, db_path: str = "./recipes.db"):
+    def __init__(self, db_path: str = "./recipes.db", pragmas=CONNECTION_PRAGMAS, codec: str = TEXT):
+        # codec picks the format for new rows (see recipe_codec); rows in any format
+        # are always readable, so switching codecs needs no migration.
+        if codec not in CODECS:
+            raise ValueError(f"unknown codec: {codec}")
+        if codec == ZSTD:
+            _zstd()
         self.db_path = db_path
-        self._ensure_db()
+        self.pragmas = pragmas
+        self.codec = codec
+        # Signatures are only maintained with numpy installed; a later open with numpy
+        # indexes whatever was saved without it.
+        self.similarity_enabled = similarity.available()
+        self._local = threading.local()
+        self._connections: set = set()
+        self._connections_lock = threading.Lock()
+        self._signatures_checked = False
+        with self._connect() as con:
+            self.fts_enabled = con.execute("SELECT 1 FROM sqlite_master WHERE name='recipes_fts'").fetchone() is not None
 
     def _connect(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
+        # One long-lived connection per thread; sqlite3 keeps its prepared statement
+        # cache per connection, so reuse also avoids re-preparing every query. The
+        # connection is closed when its thread exits or on close().
+        holder = getattr(self._local, "holder", None)
+        if holder is not None:
+            return holder.conn
+        conn = sqlite3.connect(self.db_path, timeout=30.0, cached_statements=256, check_same_thread=False)
         conn.row_factory = sqlite3.Row
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        self._ensure_db(conn)
+        holder = self._local.holder = _ConnectionHolder(conn)
+        with self._connections_lock:
+            self._connections.add(conn)
+        weakref.finalize(holder, _release_connection, self._connections, self._connections_lock, conn)
         return conn
 
-    def _ensure_db(self):
+    def _ensure_db(self, con: sqlite3.Connection):
+        # Checked on every new connection: the file may have been replaced since this
+        # store (or another one) last saw it, and each ":memory:" connection is its own
+        # database. A current user_version means the schema is in place; only the
+        # signature backfill still runs, for rows saved while numpy was missing.
+        with _INIT_LOCK:
+            if con.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+                if self.similarity_enabled and not self._signatures_checked:
+                    with con:
+                        self._index_missing_signatures(con)
+                    self._signatures_checked = True
+                return
+            with con:
+                con.executescript(INIT_SQL)
+                self._migrate(con)
+                con.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._signatures_checked = True
+
+    def _migrate(self, con: sqlite3.Connection):
+        existing = {row[1] for row in con.execute("PRAGMA table_info(recipes)")}
+        for name, decl in MIGRATION_COLUMNS:
+            if name not in existing:
+                con.execute(f"ALTER TABLE recipes ADD COLUMN {name} {decl}")
+        con.executescript(POST_MIGRATION_SQL)
+        self._ensure_children(con)
+        self._ensure_fts(con)
+        con.executescript(SIMILARITY_SQL)
+        if self.similarity_enabled:
+            with con:
+                self._index_missing_signatures(con)
+
+    def rebuild_similarity_index(self):
+        similarity._np()
+        with self._connect() as con:
+            con.execute("DELETE FROM recipe_lsh")
+            con.execute("DELETE FROM recipe_signatures")
+            self._index_missing_signatures(con)
+
+    def _index_missing_signatures(self, con: sqlite3.Connection):
+        cur = con.execute("SELECT id, json FROM recipes WHERE id NOT IN (SELECT recipe_id FROM recipe_signatures)")
+        while True:
+            batch = cur.fetchmany(_LOOKUP_CHUNK)
+            if not batch:
+                break
+            recipes = [self._decode_or_none(blob) for _, blob in batch]
+            self._insert_signatures(con, [rid for rid, _ in batch], similarity.signatures(recipes))
+
+    def _insert_signatures(self, con: sqlite3.Connection, ids: List[str], sigs):
+        keys = similarity.band_keys(sigs).tolist()
+        con.executemany("INSERT OR REPLACE INTO recipe_signatures (recipe_id, sig) VALUES (?, ?)", [(rid, similarity.to_blob(sig)) for rid, sig in zip(ids, sigs)])
+        con.executemany(
+            "INSERT OR IGNORE INTO recipe_lsh (band, bucket, recipe_id) VALUES (?, ?, ?)",
+            [(b, key, rid) for rid, ok, row in zip(ids, similarity.nonempty(sigs).tolist(), keys) if ok for b, key in enumerate(row)],
+        )
+
+    def _ensure_children(self, con: sqlite3.Connection):
+        existed = con.execute("SELECT 1 FROM sqlite_master WHERE name='recipe_ingredients'").fetchone() is not None
+        con.executescript(CHILD_SQL)
+        if not existed:
+            with con:
+                self._backfill_children(con)
+
+    def rebuild_child_tables(self):
         with self._connect() as con:
-            con.executescript(INIT_SQL)
+            for table in ("recipe_ingredients", "recipe_steps", "recipe_equipment"):
+                con.execute(f"DELETE FROM {table}")
+            self._backfill_children(con)
+
+    def _backfill_children(self, con: sqlite3.Connection):
+        cur = con.execute("SELECT id, json FROM recipes")
+        while True:
+            batch = cur.fetchmany(_LOOKUP_CHUNK)
+            if not batch:
+                break
+            self._insert_children(con, [(rid, self._decode_or_none(blob)) for rid, blob in batch])
+
+    def _decode_or_none(self, value: Any) -> Any:
+        # Hand-edited or truncated legacy rows must not block the migration.
+        try:
+            return decode_recipe(value)
+        except ValueError:
+            return None
+
+    def _insert_children(self, con: sqlite3.Connection, pairs: List[Tuple[str, Any]]):
+        tables = ([], [], [])
+        for rid, recipe in pairs:
+            for acc, rows in zip(tables, _child_rows(rid, recipe)):
+                acc.extend(rows)
+        for sql, rows in zip(CHILD_INSERT_SQL, tables):
+            if rows:
+                con.executemany(sql, rows)
+
+    def _ensure_fts(self, con: sqlite3.Connection):
+        # FTS5 is optional in SQLite builds; without it search() falls back to LIKE.
+        existed = con.execute("SELECT 1 FROM sqlite_master WHERE name='recipes_fts'").fetchone() is not None
+        try:
+            con.executescript(FTS_SQL)
+        except sqlite3.OperationalError:
+            return
+        if not existed:
+            with con:
+                con.execute(FTS_BACKFILL_SQL)
+                self._backfill_encoded(con)
+
+    def rebuild_search_index(self):
+        if not self.fts_enabled:
+            return
+        with self._connect() as con:
+            con.execute("DELETE FROM recipes_fts")
+            con.execute(FTS_BACKFILL_SQL)
+            self._backfill_encoded(con)
+
+    def _backfill_encoded(self, con: sqlite3.Connection):
+        rows = con.execute("SELECT id, title, json FROM recipes WHERE typeof(json) = 'blob'")
+        con.executemany(FTS_INSERT_SQL, (self._fts_entry(rid, title, decode_recipe(blob)) for rid, title, blob in rows))
+
+    def _fts_entry(self, rid: str, title: str, recipe: Any) -> tuple:
+        recipe = recipe if isinstance(recipe, dict) else {}
+        return (rid, title, _fts_join(recipe.get("ingredients"), "name"), _fts_join(recipe.get("steps"), "instruction"))
+
+    def _after_insert(self, con: sqlite3.Connection, rows: List[tuple], recipes: List[Dict[str, Any]], sigs=None):
+        self._insert_children(con, [(row[0], recipe) for row, recipe in zip(rows, recipes)])
+        if self.similarity_enabled and rows:
+            self._insert_signatures(con, [row[0] for row in rows], sigs if sigs is not None else similarity.signatures(recipes))
+        # The FTS triggers skip BLOB rows, so compressed recipes are indexed here.
+        if self.codec != TEXT and self.fts_enabled:
+            con.executemany(FTS_INSERT_SQL, [self._fts_entry(row[0], row[2], recipe) for row, recipe in zip(rows, recipes)])
+
+    def close(self):
+        with self._connections_lock:
+            conns, self._connections = self._connections, set()
+        for conn in conns:
+            conn.close()
+        self._local = threading.local()
 
     def _extract_columns(self, recipe: Dict[str, Any]) -> Tuple[str, int, str, int, int, int]:
         title = recipe.get("title", "")
@@ -51,18 +509,113 @@ class SQLiteRecipeStore(RecipeStore):
         total = int(t.get("total_min") or (prep + cook))
         return title, servings, difficulty, prep, cook, total
 
-    def save(self, recipe: Dict[str, Any], user_id: Optional[str] = None) -> str:
-        rid = uuid.uuid4().hex
+    def _content_hash(self, recipe: Dict[str, Any], user_id: Optional[str]) -> str:
+        canonical = _json.dumps_canonical(recipe)
+        return hashlib.sha256(((user_id or "") + "\0" + canonical).encode("utf-8")).hexdigest()
+
+    def _row(self, recipe: Dict[str, Any], user_id: Optional[str], now: str) -> tuple:
         title, servings, difficulty, prep, cook, total = self._extract_columns(recipe)
+        blob = encode_recipe(recipe, self.codec)
+        return (uuid.uuid4().hex, user_id, title, servings, difficulty, prep, cook, total, blob, now, now, self._content_hash(recipe, user_id))
+
+    def save(self, recipe: Dict[str, Any], user_id: Optional[str] = None, dedupe: Optional[float] = None) -> str:
+        # dedupe=<threshold> returns the id of an existing recipe of the same owner
+        # whose estimated similarity (see find_similar) is at least the threshold
+        # instead of storing a near-duplicate.
+        return self._save_batch([recipe], user_id, False, {}, dedupe)[0]
+
+    def save_many(self, recipes: Iterable[Dict[str, Any]], user_id: Optional[str] = None, batch_size: int = 500, upsert: bool = False, dedupe: Optional[float] = None) -> List[str]:
+        # Consumes any iterable (including generators) in batches; each batch is one
+        # transaction and one executemany. With upsert=True, recipes whose content hash
+        # is already stored (or repeated earlier in the input) map to the existing id.
+        # dedupe works as in save(), also against earlier recipes in the input.
+        if batch_size < 1:
+            raise ValueError("batch_size must be >= 1")
+        ids: List[str] = []
+        batch: List[Dict[str, Any]] = []
+        seen: Dict[str, str] = {}
+        for recipe in recipes:
+            batch.append(recipe)
+            if len(batch) >= batch_size:
+                ids.extend(self._save_batch(batch, user_id, upsert, seen, dedupe))
+                batch = []
+        if batch:
+            ids.extend(self._save_batch(batch, user_id, upsert, seen, dedupe))
+        return ids
+
+    def _save_batch(self, batch: List[Dict[str, Any]], user_id: Optional[str], upsert: bool, seen: Dict[str, str], dedupe: Optional[float]) -> List[str]:
+        if dedupe is not None:
+            similarity._np()
         now = datetime.datetime.utcnow().isoformat(timespec="seconds")
-        blob = json.dumps(recipe, ensure_ascii=False)
+        rows = [self._row(recipe, user_id, now) for recipe in batch]
+        ids = [row[0] for row in rows]
+        keep = list(range(len(rows)))
+        touched = []
         with self._connect() as con:
-            con.execute(
-                "INSERT INTO recipes (id, user_id, title, servings, difficulty, time_prep_min, time_cook_min, time_total_min, json, created_at, updated_at) "
-                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                (rid, user_id, title, servings, difficulty, prep, cook, total, blob, now, now),
-            )
-        return rid
+            if (upsert or dedupe is not None) and not con.in_transaction:
+                # Take the write lock before the existence checks; with a deferred
+                # transaction two writers could both miss a hash and insert it twice.
+                con.execute("BEGIN IMMEDIATE")
+            if upsert:
+                lookup = [row[11] for row in rows if row[11] not in seen]
+                for i in range(0, len(lookup), _LOOKUP_CHUNK):
+                    chunk = lookup[i:i + _LOOKUP_CHUNK]
+                    marks = ",".join("?" * len(chunk))
+                    for rid, digest in con.execute(f"SELECT id, content_hash FROM recipes WHERE content_hash IN ({marks})", chunk):
+                        seen.setdefault(digest, rid)
+                keep = []
+                for i, row in enumerate(rows):
+                    existing = seen.get(row[11])
+                    if existing is not None:
+                        ids[i] = existing
+                        touched.append((now, existing))
+                    else:
+                        seen[row[11]] = row[0]
+                        keep.append(i)
+            sigs = None
+            if self.similarity_enabled:
+                sigs = similarity.signatures([batch[i] for i in keep])
+                if dedupe is not None:
+                    keep, sigs = self._dedupe(con, batch, keep, sigs, ids, user_id, dedupe, seen)
+            con.executemany(INSERT_SQL, [rows[i] for i in keep])
+            self._after_insert(con, [rows[i] for i in keep], [batch[i] for i in keep], sigs)
+            if touched:
+                con.executemany("UPDATE recipes SET updated_at=? WHERE id=?", touched)
+        return ids
+
+    def _dedupe(self, con: sqlite3.Connection, batch, keep: List[int], sigs, ids: List[str], user_id: Optional[str], threshold: float, seen: Dict[str, str]):
+        # Drops recipes that match a stored recipe of the same owner, or one accepted
+        # earlier in this batch, at or above threshold; their ids point at the match.
+        keys = similarity.band_keys(sigs).tolist()
+        nonempty = similarity.nonempty(sigs).tolist()
+        local: Dict[Tuple[int, int], List[int]] = {}
+        accepted: List[int] = []
+        remap: Dict[str, str] = {}
+        for pos, i in enumerate(keep):
+            if not nonempty[pos]:
+                accepted.append(pos)
+                continue
+            best = self._similar(con, sigs[pos], keys[pos], "r.user_id IS ?", (user_id,), 1, threshold)
+            match = (best[0].similarity, best[0].id) if best else (-1.0, None)
+            nearby = sorted({p for b, key in enumerate(keys[pos]) for p in local.get((b, key), ())})
+            if nearby:
+                scores = similarity.similarity(sigs[pos], sigs[nearby])
+                j = int(scores.argmax())
+                if scores[j] > match[0]:
+                    match = (float(scores[j]), ids[keep[nearby[j]]])
+            if match[1] is not None and match[0] >= threshold:
+                remap[ids[i]] = match[1]
+                continue
+            accepted.append(pos)
+            for b, key in enumerate(keys[pos]):
+                local.setdefault((b, key), []).append(pos)
+        if remap:
+            # Later content-hash duplicates may already point at a dropped row.
+            ids[:] = [remap.get(rid, rid) for rid in ids]
+            for digest, rid in seen.items():
+                if rid in remap:
+                    seen[digest] = remap[rid]
+        return [keep[p] for p in accepted], sigs[accepted]
 
     def get(self, recipe_id: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
         with self._connect() as con:
@@ -70,37 +623,192 @@ class SQLiteRecipeStore(RecipeStore):
                 row = con.execute("SELECT * FROM recipes WHERE id=? AND (user_id IS ? OR user_id=?)", (recipe_id, None, user_id)).fetchone()
             else:
                 row = con.execute("SELECT * FROM recipes WHERE id=?", (recipe_id,)).fetchone()
-        return dict(row) if row else None
+        return _decoded(row) if row else None
 
-    def list(self, user_id: Optional[str] = None, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+    def get_lazy(self, recipe_id: str, user_id: Optional[str] = None) -> Optional[LazyRecipe]:
+        # Reads only the table columns; the JSON is fetched if the recipe body is used.
         with self._connect() as con:
             if user_id:
-                rows = con.execute(
-                    "SELECT * FROM recipes WHERE user_id IS ? OR user_id=? ORDER BY created_at DESC LIMIT ? OFFSET ?",
-                    (None, user_id, limit, offset),
-                ).fetchall()
+                row = con.execute(f"SELECT {_LAZY_COLUMNS} FROM recipes WHERE id=? AND (user_id IS ? OR user_id=?)", (recipe_id, None, user_id)).fetchone()
             else:
-                rows = con.execute(
-                    "SELECT * FROM recipes ORDER BY created_at DESC LIMIT ? OFFSET ?",
-                    (limit, offset),
+                row = con.execute(f"SELECT {_LAZY_COLUMNS} FROM recipes WHERE id=?", (recipe_id,)).fetchone()
+        return LazyRecipe(self, dict(row)) if row else None
+
+    def list(self, user_id: Optional[str] = None, limit: int = 50, offset: int = 0, after: Optional[str] = None, fields: Optional[Sequence[str]] = None) -> List[Any]:
+        # Newest first. Pass after=<cursor> (see list_page/encode_cursor) for keyset
+        # paging that stays flat at any depth; offset still works but scans skipped rows.
+        # With fields=[...] only those columns are read and rows come back as
+        # RecipeSummary namedtuples instead of full dicts.
+        return self._shape(self._list_rows(user_id, limit, offset, after, fields), fields)
+
+    def list_page(self, user_id: Optional[str] = None, limit: int = 50, after: Optional[str] = None, fields: Optional[Sequence[str]] = None) -> Page:
+        return self._page(self._list_rows(user_id, limit, 0, after, fields), limit, fields)
+
+    def search(self, q: str, user_id: Optional[str] = None, limit: int = 50, offset: int = 0, after: Optional[str] = None, order: str = "rank", fields: Optional[Sequence[str]] = None) -> List[Any]:
+        # Ranked full-text search over title, ingredients and steps; every word in q
+        # is matched as a prefix. order="recent" sorts newest first and supports
+        # after=<cursor>. Falls back to a title LIKE scan without FTS5. fields works
+        # as in list().
+        return self._shape(self._search_rows(q, user_id, limit, offset, after, order, fields), fields)
+
+    def search_page(self, q: str, user_id: Optional[str] = None, limit: int = 50, after: Optional[str] = None, fields: Optional[Sequence[str]] = None) -> Page:
+        return self._page(self._search_rows(q, user_id, limit, 0, after, "recent", fields), limit, fields)
+
+    def _list_rows(self, user_id, limit, offset, after, fields) -> List[sqlite3.Row]:
+        select = _projection(fields)[1] if fields is not None else "r.*"
+        with self._connect() as con:
+            return self._recent(con, select, "recipes r", "", (), user_id, limit, offset, after)
+
+    def _search_rows(self, q, user_id, limit, offset, after, order, fields) -> List[sqlite3.Row]:
+        if order not in ("rank", "recent"):
+            raise ValueError("order must be 'rank' or 'recent'")
+        if after is not None and order != "recent":
+            raise ValueError("cursor pagination requires order='recent'")
+        select = _projection(fields)[1] if fields is not None else "r.*"
+        match = self._fts_query(q) if self.fts_enabled else None
+        with self._connect() as con:
+            if match is None:
+                return self._recent(con, select, "recipes r", "lower(r.title) LIKE ?", (f"%{q.lower()}%",), user_id, limit, offset, after)
+            if order == "recent":
+                return self._recent(con, select, _FTS_SOURCE, "recipes_fts MATCH ?", (match,), user_id, limit, offset, after)
+            if user_id:
+                return con.execute(
+                    f"SELECT {select} FROM {_FTS_SOURCE} WHERE recipes_fts MATCH ? AND (r.user_id IS ? OR r.user_id=?) ORDER BY {_FTS_RANK} LIMIT ? OFFSET ?",
+                    (match, None, user_id, limit, offset),
                 ).fetchall()
-        return [dict(r) for r in rows]
+            return con.execute(
+                f"SELECT {select} FROM {_FTS_SOURCE} WHERE recipes_fts MATCH ? ORDER BY {_FTS_RANK} LIMIT ? OFFSET ?",
+                (match, limit, offset),
+            ).fetchall()
+
+    def _shape(self, rows: List[sqlite3.Row], fields: Optional[Sequence[str]]) -> List[Any]:
+        if fields is None:
+            return [_decoded(r) for r in rows]
+        fields = tuple(fields)
+        make, n = summary_type(fields)._make, len(fields)
+        if "json" in fields:
+            j = fields.index("json")
+            return [make(decode_json_text(v) if i == j else v for i, v in enumerate(tuple(r)[:n])) for r in rows]
+        return [make(tuple(r)[:n]) for r in rows]
+
+    def _page(self, rows: List[sqlite3.Row], limit: int, fields: Optional[Sequence[str]]) -> Page:
+        # The cursor comes from the raw row, which always carries created_at and id.
+        cursor = encode_cursor(rows[-1]) if rows and len(rows) >= limit else None
+        return Page(items=self._shape(rows, fields), next_cursor=cursor)
+
+    def _recent(self, con: sqlite3.Connection, select: str, source: str, where: str, params: tuple, user_id: Optional[str], limit: int, offset: int, after: Optional[str]):
+        # Newest-first rows from source (aliasing recipes as r). The shared-plus-own
+        # visibility rule is split into two index-ordered branches merged by UNION ALL,
+        # since "user_id IS NULL OR user_id = ?" cannot use idx_recipes_user_created_cover.
+        conds, args = ([where], list(params)) if where else ([], [])
+        if after is not None:
+            conds.append("(r.created_at, r.id) < (?, ?)")
+            args.extend(_decode_cursor(after))
+
+        def branch(extra: Optional[str]) -> str:
+            c = ([extra] if extra else []) + conds
+            return f"SELECT {select} FROM {source}" + (" WHERE " + " AND ".join(c) if c else "") + " ORDER BY r.created_at DESC, r.id DESC LIMIT ?"
+
+        if not user_id:
+            return con.execute(branch(None) + " OFFSET ?", (*args, limit, offset)).fetchall()
+        window = limit + offset
+        sql = (
+            f"SELECT * FROM ({branch('r.user_id IS NULL')}) UNION ALL SELECT * FROM ({branch('r.user_id = ?')}) "
+            "ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?"
+        )
+        return con.execute(sql, (*args, window, user_id, *args, window, limit, offset)).fetchall()
+
+    def find_by_ingredient(self, name: str, user_id: Optional[str] = None, limit: int = 50, offset: int = 0, after: Optional[str] = None, fields: Optional[Sequence[str]] = None) -> List[Any]:
+        # Newest recipes that use the ingredient (case and whitespace insensitive),
+        # answered from idx_recipe_ingredients_name. Paging and fields as in list().
+        return self._find_by_child("recipe_ingredients", name, user_id, limit, offset, after, fields)
+
+    def find_by_equipment(self, name: str, user_id: Optional[str] = None, limit: int = 50, offset: int = 0, after: Optional[str] = None, fields: Optional[Sequence[str]] = None) -> List[Any]:
+        return self._find_by_child("recipe_equipment", name, user_id, limit, offset, after, fields)
 
-    def search(self, q: str, user_id: Optional[str] = None, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
-        pattern = f"%{q.lower()}%"
+    def _find_by_child(self, table: str, name: str, user_id, limit, offset, after, fields) -> List[Any]:
+        select = _projection(fields)[1] if fields is not None else "r.*"
+        where = f"r.id IN (SELECT recipe_id FROM {table} WHERE name_norm = ?)"
+        with self._connect() as con:
+            rows = self._recent(con, select, "recipes r", where, (_norm(name),), user_id, limit, offset, after)
+        return self._shape(rows, fields)
+
+    def top_ingredients(self, user_id: Optional[str] = None, limit: int = 20) -> List[Tuple[str, int]]:
+        # (normalized name, number of recipes using it), most common first.
         with self._connect() as con:
             if user_id:
                 rows = con.execute(
-                    "SELECT * FROM recipes WHERE (user_id IS ? OR user_id=?) AND lower(title) LIKE ? ORDER BY created_at DESC LIMIT ? OFFSET ?",
-                    (None, user_id, pattern, limit, offset),
+                    "SELECT i.name_norm, COUNT(DISTINCT i.recipe_id) AS n FROM recipe_ingredients i JOIN recipes r ON r.id = i.recipe_id "
+                    "WHERE i.name_norm IS NOT NULL AND (r.user_id IS ? OR r.user_id=?) GROUP BY i.name_norm ORDER BY n DESC, i.name_norm LIMIT ?",
+                    (None, user_id, limit),
                 ).fetchall()
             else:
                 rows = con.execute(
-                    "SELECT * FROM recipes WHERE lower(title) LIKE ? ORDER BY created_at DESC LIMIT ? OFFSET ?",
-                    (pattern, limit, offset),
+                    "SELECT name_norm, COUNT(DISTINCT recipe_id) AS n FROM recipe_ingredients WHERE name_norm IS NOT NULL GROUP BY name_norm ORDER BY n DESC, name_norm LIMIT ?",
+                    (limit,),
                 ).fetchall()
+        return [(r[0], r[1]) for r in rows]
+
+    def stats_by_difficulty(self, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        # Aggregated from the recipe columns (covered by idx_recipes_difficulty_times),
+        # so no document is decoded.
+        sql = (
+            "SELECT difficulty, COUNT(*) AS recipes, AVG(servings) AS avg_servings, AVG(time_prep_min) AS avg_prep_min, "
+            "AVG(time_cook_min) AS avg_cook_min, AVG(time_total_min) AS avg_total_min, SUM(time_cook_min) AS total_cook_min "
+            "FROM recipes r {where} GROUP BY difficulty ORDER BY difficulty"
+        )
+        with self._connect() as con:
+            if user_id:
+                rows = con.execute(sql.format(where="WHERE (r.user_id IS ? OR r.user_id=?)"), (None, user_id)).fetchall()
+            else:
+                rows = con.execute(sql.format(where="")).fetchall()
         return [dict(r) for r in rows]
 
+    def find_similar(self, recipe: Any, k: int = 10, user_id: Optional[str] = None, min_similarity: float = 0.0) -> List[SimilarRecipe]:
+        # Up to k stored recipes most similar to recipe (a dict, or the id of a stored
+        # recipe, which is then left out), best first. Only recipes sharing an LSH
+        # bucket are scored, so near-duplicates are found without a full scan;
+        # pairs below roughly 0.5 estimated similarity are usually not candidates.
+        similarity._np()
+        exclude = None
+        with self._connect() as con:
+            if isinstance(recipe, str):
+                row = con.execute("SELECT sig FROM recipe_signatures WHERE recipe_id=?", (recipe,)).fetchone()
+                if row is None:
+                    return []
+                exclude, sig = recipe, similarity.from_blobs([row[0]])[0]
+            else:
+                if not similarity.features(recipe):
+                    return []
+                sig = similarity.signatures([recipe])[0]
+            keys = similarity.band_keys(sig[None, :])[0].tolist()
+            where, params = ("(r.user_id IS ? OR r.user_id=?)", (None, user_id)) if user_id else ("", ())
+            found = self._similar(con, sig, keys, where, params, k + (exclude is not None), min_similarity)
+        return [f for f in found if f.id != exclude][:k]
+
+    def _similar(self, con: sqlite3.Connection, sig, keys: List[int], where: str, params: tuple, k: int, min_similarity: float) -> List[SimilarRecipe]:
+        candidates = [r[0] for r in con.execute(_LSH_CANDIDATES_SQL, [v for b, key in enumerate(keys) for v in (b, key)])]
+        ids, titles, blobs = [], [], []
+        for i in range(0, len(candidates), _LOOKUP_CHUNK):
+            chunk = candidates[i:i + _LOOKUP_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            sql = f"SELECT s.recipe_id, r.title, s.sig FROM recipe_signatures s JOIN recipes r ON r.id = s.recipe_id WHERE s.recipe_id IN ({marks})"
+            for rid, title, blob in con.execute(sql + (" AND " + where if where else ""), (*chunk, *params)):
+                ids.append(rid)
+                titles.append(title)
+                blobs.append(blob)
+        if not ids:
+            return []
+        scores = similarity.similarity(sig, similarity.from_blobs(blobs))
+        order = scores.argsort(kind="stable")[::-1][:k]
+        return [SimilarRecipe(ids[j], titles[j], float(scores[j])) for j in order if scores[j] >= min_similarity]
+
+    def _fts_query(self, q: str) -> Optional[str]:
+        terms = _FTS_TERM.findall(q)
+        if not terms:
+            return None
+        return " ".join('"' + t + '"*' for t in terms)
+
     def delete(self, recipe_id: str, user_id: Optional[str] = None) -> bool:
         with self._connect() as con:
             if user_id:
@@ -109,6 +817,16 @@ class SQLiteRecipeStore(RecipeStore):
                 cur = con.execute("DELETE FROM recipes WHERE id=?", (recipe_id,))
         return cur.rowcount > 0
 
+_STORES: Dict[str, SQLiteRecipeStore] = {}
+_STORES_LOCK = threading.Lock()
+
 def get_store() -> SQLiteRecipeStore:
     db_path = os.getenv("RECIPE_DB_PATH", "./recipes.db")
-    return SQLiteRecipeStore(db_path)
+    store = _STORES.get(db_path)
+    if store is None:
+        with _STORES_LOCK:
+            store = _STORES.get(db_path)
+            if store is None:
+                store = SQLiteRecipeStore(db_path, codec=os.getenv("RECIPE_DB_CODEC", TEXT))
+                _STORES[db_path] = store
+    return store
@@ -1,7 +1,8 @@
 
+from .providers.registry import provider_models, provider_names
+
 def get_supported_models(provider: str) -> list[str]:
-    if provider == "mock":
-        return ["mock-1"]
-    if provider == "openai":
-        return ["gpt-4o-mini", "gpt-4o"]
-    return []
+    return provider_models(provider)
+
+def get_supported_providers() -> list[str]:
+    return provider_names()
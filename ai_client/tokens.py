@@ -0,0 +1,118 @@
+
+import functools, math, re
+from typing import Optional
+from . import _json
+from .prompt import system_message
+from .recipe_schema import SCHEMA_VERSION
+
+# Token counting: tiktoken when it is installed and its encoding can be loaded,
+# otherwise estimate_tokens, a pure-Python estimate shaped like a BPE tokenizer.
+
+# A word with its leading space is one token for up to 6 letters and one more per
+# further 6, digits and punctuation runs ('":"', '"},{') go in groups of three and a
+# whitespace run counts once. Roughly 3-4 characters per token on recipe JSON and
+# ~1.3 tokens per English word.
+_PIECE = re.compile(r" ?[A-Za-z]+| ?\d+| ?[^\sA-Za-z\d]+|\s+")
+
+def estimate_tokens(text: str) -> int:
+    n = 0
+    for m in _PIECE.finditer(text):
+        p = m.group()
+        c = p[-1]
+        if c.isalpha():
+            n += 1 + (len(p.lstrip(" ")) - 1) // 6
+        elif c.isspace():
+            n += 1
+        else:
+            n += (len(p.lstrip(" ")) + 2) // 3
+    return n
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model: Optional[str]):
+    # None when tiktoken is missing or cannot load an encoding (it downloads BPE
+    # files on first use, which fails offline).
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model or "")
+    except KeyError:
+        pass
+    except Exception:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+def backend(model: Optional[str] = None) -> str:
+    return "tiktoken" if _encoding(model) is not None else "estimate"
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    enc = _encoding(model)
+    if enc is None:
+        return estimate_tokens(text)
+    return len(enc.encode(text, disallowed_special=()))
+
+# Chat framing per OpenAI's accounting: each message costs 3 tokens on top of its
+# content and the reply is primed with 3 more.
+_PER_MESSAGE = 3
+_REPLY_PRIMING = 3
+
+@functools.lru_cache(maxsize=256)
+def _system_tokens(system: Optional[str], model: Optional[str], version: int) -> int:
+    return count_tokens(system_message(system), model)
+
+def count_prompt_tokens(system: Optional[str], user: str, model: Optional[str] = None) -> int:
+    # Input tokens of a request as providers send it: the rendered system message
+    # (schema included) plus the user message.
+    return _system_tokens(system or None, model, SCHEMA_VERSION) + count_tokens(user, model) + 2 * _PER_MESSAGE + _REPLY_PRIMING
+
+# Completion sizing. A recipe's length is a fixed part (title, servings, time, keys)
+# plus a cost per ingredient and per step; the typical items below are what the
+# costs are measured on. Prompts that ask for "12 steps" or "6 ingredients" get
+# budgets for that many, otherwise the defaults apply.
+_TYPICAL_INGREDIENT = {"name": "fresh basil leaves", "quantity": 2.5, "unit": "tbsp", "notes": "finely chopped"}
+_TYPICAL_STEP = {
+    "number": 10, "instruction": "Heat the oil in a large skillet over medium heat, add the onion and garlic and cook until soft and fragrant.",
+    "duration_min": 5, "equipment": [{"name": "Large skillet", "usage": "saute the onions"}], "notes": None,
+}
+_TYPICAL_RECIPE = {
+    "title": "Weeknight Lemon Garlic Chicken Pasta", "servings": 4, "difficulty": "medium",
+    "time": {"prep_min": 15, "cook_min": 25, "total_min": 40}, "ingredients": [], "steps": [],
+}
+DEFAULT_INGREDIENTS = 8
+DEFAULT_STEPS = 6
+BUDGET_HEADROOM = 1.3
+MIN_COMPLETION_BUDGET = 256
+MAX_COMPLETION_BUDGET = 4096
+
+_NUMBER_WORDS = {w: i for i, w in enumerate("zero one two three four five six seven eight nine ten eleven twelve thirteen fourteen fifteen sixteen seventeen eighteen nineteen twenty".split())}
+_COUNT = r"(\d{1,3}|" + "|".join(_NUMBER_WORDS) + r")[\s-]*"
+_STEPS_RE = re.compile(r"\b" + _COUNT + r"(?:\w+[\s-]+)?steps?\b", re.I)
+_INGREDIENTS_RE = re.compile(r"\b" + _COUNT + r"(?:\w+[\s-]+)?ingredients?\b", re.I)
+
+def _requested(pattern: re.Pattern, text: str) -> Optional[int]:
+    m = pattern.search(text)
+    if m is None:
+        return None
+    word = m.group(1).lower()
+    return int(word) if word.isdigit() else _NUMBER_WORDS[word]
+
+@functools.lru_cache(maxsize=None)
+def _recipe_costs(model: Optional[str], version: int):
+    base = count_tokens(_json.dumps(_TYPICAL_RECIPE), model)
+    ingredient = count_tokens(_json.dumps(_TYPICAL_INGREDIENT), model) + 1
+    step = count_tokens(_json.dumps(_TYPICAL_STEP), model) + 1
+    return base, ingredient, step
+
+def completion_budget(user: str, model: Optional[str] = None) -> int:
+    # max_tokens for a recipe answer to this prompt: expected length with headroom,
+    # rounded up to a multiple of 64.
+    base, ingredient, step = _recipe_costs(model, SCHEMA_VERSION)
+    n_ing = _requested(_INGREDIENTS_RE, user) or DEFAULT_INGREDIENTS
+    n_steps = _requested(_STEPS_RE, user) or DEFAULT_STEPS
+    expected = (base + n_ing * ingredient + n_steps * step) * BUDGET_HEADROOM
+    budget = int(math.ceil(expected / 64) * 64)
+    return max(MIN_COMPLETION_BUDGET, min(MAX_COMPLETION_BUDGET, budget))
@@ -0,0 +1,96 @@
+
+import contextvars, threading
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Tuple
+
+@dataclass
+class Usage:
+    requests: int = 0
+    tokens_in: int = 0
+    tokens_out: int = 0
+    tokens_cached: int = 0
+    # Requests whose token counts were estimated locally (provider reported none).
+    estimated: int = 0
+    # Answered without a provider call; these add no tokens.
+    cache_hits: int = 0
+    coalesced: int = 0
+    # Provider outputs that were paid for but not returned (a router's hedge losers
+    # and rejected attempts); their tokens are included above.
+    discarded: int = 0
+
+    def add(self, other: "Usage"):
+        for k, v in asdict(other).items():
+            setattr(self, k, getattr(self, k) + v)
+
+class UsageLedger:
+    # Cumulative token usage per model. Every AIClient keeps its own ledger and also
+    # records into the process-wide one from default_ledger().
+    def __init__(self):
+        self.__models: Dict[str, Usage] = {}
+        self.__lock = threading.Lock()
+
+    def record(self, model: str, tokens_in: int, tokens_out: int, tokens_cached: int = 0, estimated: bool = False, discarded: bool = False):
+        with self.__lock:
+            u = self.__entry(model)
+            if discarded:
+                u.discarded += 1
+            else:
+                u.requests += 1
+            u.tokens_in += tokens_in
+            u.tokens_out += tokens_out
+            u.tokens_cached += tokens_cached
+            u.estimated += int(estimated)
+
+    def record_hit(self, model: str, coalesced: bool = False):
+        with self.__lock:
+            u = self.__entry(model)
+            if coalesced:
+                u.coalesced += 1
+            else:
+                u.cache_hits += 1
+
+    def by_model(self) -> Dict[str, Usage]:
+        with self.__lock:
+            return {m: Usage(**asdict(u)) for m, u in self.__models.items()}
+
+    def total(self) -> Usage:
+        out = Usage()
+        for u in self.by_model().values():
+            out.add(u)
+        return out
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"total": asdict(self.total()), "models": {m: asdict(u) for m, u in self.by_model().items()}}
+
+    def reset(self):
+        with self.__lock:
+            self.__models.clear()
+
+    def __entry(self, model: str) -> Usage:
+        u = self.__models.get(model)
+        if u is None:
+            u = self.__models[model] = Usage()
+        return u
+
+_DEFAULT = UsageLedger()
+
+def default_ledger() -> UsageLedger:
+    return _DEFAULT
+
+# The ledger of the client whose provider call is running, so providers that make
+# extra calls of their own (RouterProvider) can bill them to it.
+_CURRENT: contextvars.ContextVar = contextvars.ContextVar("ai_client_usage", default=None)
+
+@contextmanager
+def scoped(ledger: UsageLedger):
+    token = _CURRENT.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _CURRENT.reset(token)
+
+def ledgers() -> Tuple[UsageLedger, ...]:
+    # Where usage recorded now belongs: the scoped client ledger and the default one.
+    current = _CURRENT.get()
+    return (current, _DEFAULT) if current is not None and current is not _DEFAULT else (_DEFAULT,)
@@ -1,74 +1,160 @@
 
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .recipe_schema import schema_description, OPTIONAL_FIELDS
 
-def validate_recipe(obj: Dict[str, Any]) -> List[str]:
-    errs = []
-    if not isinstance(obj, dict):
-        return ["root not object"]
-    for k in ["title", "servings", "difficulty", "time", "ingredients", "steps"]:
-        if k not in obj:
-            errs.append(f"missing {k}")
-
-    if "title" in obj and not isinstance(obj["title"], str):
-        errs.append("title type")
-    if "servings" in obj and not isinstance(obj["servings"], int):
-        errs.append("servings type")
-    if "difficulty" in obj and not isinstance(obj["difficulty"], str):
-        errs.append("difficulty type")
-
-    if "time" in obj:
-        t = obj["time"]
-        if not isinstance(t, dict):
-            errs.append("time type")
+def _type_names(spec: str) -> Tuple[List[str], bool]:
+    types, nullable = [], False
+    for name in spec.split("|"):
+        if name == "null":
+            nullable = True
+        elif name == "str":
+            types.append("str")
+        elif name == "int":
+            types.append("int")
+        elif name == "float":
+            types.extend(["int", "float"])
         else:
-            for key in ["prep_min", "cook_min", "total_min"]:
-                if key not in t or not isinstance(t[key], int):
-                    errs.append(f"time.{key} type")
+            raise ValueError(f"unknown schema type: {name}")
+    return types, nullable
 
-    if "ingredients" in obj:
-        if not isinstance(obj["ingredients"], list):
-            errs.append("ingredients type")
-        else:
-            for i, ing in enumerate(obj["ingredients"]):
-                if not isinstance(ing, dict):
-                    errs.append(f"ingredients[{i}] type")
-                    continue
-                if "name" not in ing or not isinstance(ing["name"], str):
-                    errs.append(f"ingredients[{i}].name type")
-                if "quantity" in ing and ing["quantity"] is not None and not isinstance(ing["quantity"], (int, float)):
-                    errs.append(f"ingredients[{i}].quantity type")
-                if "unit" in ing and ing["unit"] is not None and not isinstance(ing["unit"], str):
-                    errs.append(f"ingredients[{i}].unit type")
-                if "notes" in ing and ing["notes"] is not None and not isinstance(ing["notes"], str):
-                    errs.append(f"ingredients[{i}].notes type")
-
-    if "steps" in obj:
-        if not isinstance(obj["steps"], list):
-            errs.append("steps type")
+def _is_required(spec: Any, tpl: str, optional: frozenset) -> bool:
+    if tpl in optional:
+        return False
+    return not (isinstance(spec, str) and _type_names(spec)[1])
+
+def _child(tpl: str, key: str) -> str:
+    return f"{tpl}.{key}" if tpl else key
+
+def _msg(path: str, suffix: str) -> str:
+    # path is an f-string body (loop indexes appear as {i0}, {i1}, ...).
+    return "f" + repr(path + suffix)
+
+class _CodeGen:
+    # Emits straight-line Python for one schema node. In "check" mode the code
+    # returns False on the first problem; in "report" mode it appends messages
+    # (built only on failure) to errs.
+    def __init__(self, mode: str, optional: frozenset):
+        self.mode = mode
+        self.optional = optional
+        self.lines: List[str] = []
+        self.n = 0
+
+    def fresh(self, prefix: str) -> str:
+        self.n += 1
+        return f"{prefix}{self.n}"
+
+    def fail(self, indent: str, path: str, suffix: str = " type"):
+        if self.mode == "check":
+            self.lines.append(f"{indent}return False")
         else:
-            for i, st in enumerate(obj["steps"]):
-                if not isinstance(st, dict):
-                    errs.append(f"steps[{i}] type")
-                    continue
-                if "number" not in st or not isinstance(st["number"], int):
-                    errs.append(f"steps[{i}].number type")
-                if "instruction" not in st or not isinstance(st["instruction"], str):
-                    errs.append(f"steps[{i}].instruction type")
-                if "duration_min" in st and st["duration_min"] is not None and not isinstance(st["duration_min"], int):
-                    errs.append(f"steps[{i}].duration_min type")
-                if "equipment" in st:
-                    if not isinstance(st["equipment"], list):
-                        errs.append(f"steps[{i}].equipment type")
-                    else:
-                        for j, eq in enumerate(st["equipment"]):
-                            if not isinstance(eq, dict):
-                                errs.append(f"steps[{i}].equipment[{j}] type")
-                                continue
-                            if "name" not in eq or not isinstance(eq["name"], str):
-                                errs.append(f"steps[{i}].equipment[{j}].name type")
-                            if "usage" in eq and eq["usage"] is not None and not isinstance(eq["usage"], str):
-                                errs.append(f"steps[{i}].equipment[{j}].usage type")
-                if "notes" in st and st["notes"] is not None and not isinstance(st["notes"], str):
-                    errs.append(f"steps[{i}].notes type")
-
-    return errs
+            self.lines.append(f"{indent}errs.append({_msg(path, suffix)})")
+
+    def node(self, spec: Any, var: str, tpl: str, path: str, indent: str):
+        if isinstance(spec, str):
+            types, nullable = _type_names(spec)
+            cond = f"isinstance({var}, {types[0] if len(types) == 1 else '(' + ', '.join(types) + ')'})"
+            if nullable:
+                cond = f"{var} is not None and not {cond}"
+            else:
+                cond = f"not {cond}"
+            self.lines.append(f"{indent}if {cond}:")
+            self.fail(indent + "    ", path)
+            return
+        kind = "list" if isinstance(spec, list) else "dict"
+        self.lines.append(f"{indent}if not isinstance({var}, {kind}):")
+        self.fail(indent + "    ", path)
+        if self.mode == "report":
+            self.lines.append(f"{indent}else:")
+            indent += "    "
+        if kind == "list":
+            idx, item = self.fresh("i"), self.fresh("x")
+            if self.mode == "report":
+                self.lines.append(f"{indent}for {idx}, {item} in enumerate({var}):")
+            else:
+                self.lines.append(f"{indent}for {item} in {var}:")
+            self.node(spec[0], item, tpl + "[]", path + "[{" + idx + "}]", indent + "    ")
+            return
+        for key, sub in spec.items():
+            sub_var, sub_tpl = self.fresh("v"), _child(tpl, key)
+            sub_path = path + "." + key.replace("{", "{{").replace("}", "}}")
+            self.lines.append(f"{indent}if {key!r} in {var}:")
+            self.lines.append(f"{indent}    {sub_var} = {var}[{key!r}]")
+            self.node(sub, sub_var, sub_tpl, sub_path, indent + "    ")
+            if _is_required(sub, sub_tpl, self.optional):
+                self.lines.append(f"{indent}else:")
+                self.fail(indent + "    ", sub_path)
+
+def _compile(name: str, params: str, mode: str, body: Callable[[_CodeGen], None], tail: str, optional: frozenset) -> Callable:
+    gen = _CodeGen(mode, optional)
+    gen.lines.append(f"def {name}({params}, isinstance=isinstance, str=str, int=int, float=float, dict=dict, list=list, enumerate=enumerate):")
+    body(gen)
+    gen.lines.append(f"    {tail}")
+    ns: Dict[str, Any] = {}
+    exec("\n".join(gen.lines), ns)
+    return ns[name]
+
+class RecipeValidator:
+    # Compiled once from a schema_description()-style spec. is_valid() stops at the
+    # first problem; validate() collects every error. Both are pure: callers that need
+    # a verdict more than once keep the result rather than asking again.
+    def __init__(self, schema: Optional[Dict[str, Any]] = None, optional_fields: Optional[List[str]] = None):
+        schema = schema if schema is not None else schema_description()
+        optional = frozenset(optional_fields if optional_fields is not None else OPTIONAL_FIELDS)
+        required = [k for k, sub in schema.items() if _is_required(sub, k, optional)]
+
+        def check_body(gen: _CodeGen):
+            gen.node(schema, "obj", "", "", "    ")
+
+        def report_body(gen: _CodeGen):
+            gen.lines.append("    if not isinstance(obj, dict):")
+            gen.lines.append("        return ['root not object']")
+            gen.lines.append("    errs = []")
+            for k in required:
+                gen.lines.append(f"    if {k!r} not in obj:")
+                gen.lines.append(f"        errs.append({('missing ' + k)!r})")
+            for k, sub in schema.items():
+                var = gen.fresh("v")
+                gen.lines.append(f"    if {k!r} in obj:")
+                gen.lines.append(f"        {var} = obj[{k!r}]")
+                gen.node(sub, var, k, k.replace("{", "{{").replace("}", "}}"), "        ")
+
+        self.__check = _compile("check", "obj", "check", check_body, "return True", optional)
+        self.__report = _compile("report", "obj", "report", report_body, "return errs", optional)
+        self.__fields: Dict[str, Callable] = {}
+        self.__items: Dict[str, Callable] = {}
+        for k, sub in schema.items():
+            path = k.replace("{", "{{").replace("}", "}}")
+            self.__fields[k] = _compile("field", "value, errs", "report", lambda gen, sub=sub, k=k, path=path: gen.node(sub, "value", k, path, "    "), "return errs", optional)
+            if isinstance(sub, list):
+                self.__items[k] = _compile("item", "value, index, errs", "report", lambda gen, sub=sub, k=k, path=path: gen.node(sub[0], "value", k + "[]", path + "[{index}]", "    "), "return errs", optional)
+
+    def is_valid(self, obj: Any) -> bool:
+        return self.__check(obj)
+
+    def validate(self, obj: Any) -> List[str]:
+        return self.__report(obj)
+
+    def validate_field(self, key: str, value: Any) -> List[str]:
+        rep = self.__fields.get(key)
+        return rep(value, []) if rep is not None else []
+
+    def validate_item(self, key: str, value: Any, index: int) -> List[str]:
+        rep = self.__items.get(key)
+        return rep(value, index, []) if rep is not None else []
+
+_VALIDATOR = RecipeValidator()
+
+def is_valid_recipe(obj: Any) -> bool:
+    return _VALIDATOR.is_valid(obj)
+
+def validate_recipe(obj: Dict[str, Any]) -> List[str]:
+    return _VALIDATOR.validate(obj)
+
+def validate_recipe_field(key: str, value: Any) -> List[str]:
+    return _VALIDATOR.validate_field(key, value)
+
+def validate_ingredient(ing: Any, i: int) -> List[str]:
+    return _VALIDATOR.validate_item("ingredients", ing, i)
+
+def validate_step(st: Any, i: int) -> List[str]:
+    return _VALIDATOR.validate_item("steps", st, i)
@@ -0,0 +1,33 @@
+"""JSON backends: stdlib json vs the orjson path in ai_client._json.
+
+Run with: python -m benchmarks.bench_json [--iterations 2000]
+"""
+import argparse, time
+from ai_client import _json
+from . import corpus
+
+SIZES = ("small", "medium")
+
+def _per_call_us(fn, arg, iterations: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        fn(arg)
+    return (time.perf_counter() - t0) / iterations * 1e6
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--iterations", type=int, default=2000)
+    args = ap.parse_args()
+    if _json.BACKEND == "json":
+        print("orjson not installed: both columns measure stdlib json")
+    print(f"{'payload':<8}{'bytes':>9}{'op':>7}{'json us':>10}{_json.BACKEND + ' us':>12}{'speedup':>9}")
+    for name in SIZES:
+        recipe = corpus.recipe(0, name)
+        text = _json.dumps(recipe)
+        for op, std, fast, arg in (("dumps", _json._std_dumps, _json.dumps, recipe), ("loads", _json._std_loads, _json.loads, text)):
+            a = _per_call_us(std, arg, args.iterations)
+            b = _per_call_us(fast, arg, args.iterations)
+            print(f"{name:<8}{len(text.encode('utf-8')):>9}{op:>7}{a:>10.1f}{b:>12.1f}{a / b:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Deep-page latency: list(offset=...) vs list(after=<cursor>) on a large store.
+
+Run with: python -m benchmarks.bench_pagination [--rows 100000] [--page 1000]
+"""
+import argparse, os, tempfile, time
+from ai_client.storage import SQLiteRecipeStore, encode_cursor
+
+def _ms(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100000)
+    ap.add_argument("--page", type=int, default=1000, help="page number to fetch")
+    ap.add_argument("--limit", type=int, default=50)
+    args = ap.parse_args()
+    offset = (args.page - 1) * args.limit
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteRecipeStore(os.path.join(tmp, "pages.db"))
+        store.save_many(({"title": f"Recipe {i}"} for i in range(args.rows // 2)))
+        store.save_many(({"title": f"Mine {i}"} for i in range(args.rows // 2)), user_id="u1")
+        results = []
+        for label, user_id in (("all", None), ("user u1", "u1")):
+            prev = store.list(user_id=user_id, limit=1, offset=offset - 1)
+            cursor = encode_cursor(prev[0])
+            assert store.list(user_id=user_id, limit=args.limit, offset=offset) == store.list(user_id=user_id, limit=args.limit, after=cursor)
+            results.append((f"{label}: offset", _ms(lambda: store.list(user_id=user_id, limit=args.limit, offset=offset))))
+            results.append((f"{label}: cursor", _ms(lambda: store.list(user_id=user_id, limit=args.limit, after=cursor))))
+        store.close()
+    print(f"page {args.page} x {args.limit} of {args.rows} rows")
+    print(f"{'query':<24}{'ms':>10}")
+    for name, ms in results:
+        print(f"{name:<24}{ms:>10.2f}")
+
+if __name__ == "__main__":
+    main()
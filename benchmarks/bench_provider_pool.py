@@ -0,0 +1,36 @@
+"""Per-request latency with a fresh OpenAI provider vs the shared, pooled one.
+
+Runs against benchmarks.fake_openai_server, so no network access or real key is
+needed (requires the openai package). Run with:
+    python -m benchmarks.bench_provider_pool [--requests 200]
+"""
+import argparse, statistics, time
+from ai_client.providers.provider_openai import OpenAIProvider
+from ai_client.providers.registry import get_provider, clear_providers
+from .fake_openai_server import FakeOpenAIServer
+
+def _measure(make_provider, n: int):
+    samples = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        provider = make_provider()
+        provider.generate("", f"bench prompt {i}", "gpt-4o-mini", 0.2, 800)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=200)
+    args = ap.parse_args()
+    with FakeOpenAIServer() as server:
+        fresh = _measure(lambda: OpenAIProvider(api_key="sk-bench", base_url=server.base_url), args.requests)
+        pooled = _measure(lambda: get_provider("openai", api_key="sk-bench", base_url=server.base_url), args.requests)
+        clear_providers()
+    print(f"{'mode':<10}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}")
+    for name, samples in (("fresh", fresh), ("pooled", pooled)):
+        p95 = statistics.quantiles(samples, n=20)[-1]
+        print(f"{name:<10}{statistics.median(samples):>10.2f}{p95:>10.2f}{statistics.fmean(samples):>10.2f}")
+    print(f"saved per request (mean): {statistics.fmean(fresh) - statistics.fmean(pooled):.2f} ms (plain HTTP; TLS handshakes add more in production)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""Compare the single-pass repair engine against the legacy multi-pass pipeline.
+
+Run with: python -m benchmarks.bench_repair
+"""
+import timeit
+from . import corpus
+from ai_client.json_repair import strip_code_fences, extract_json_region, remove_trailing_commas, balance_brackets, repair_json_structure
+
+def legacy_repair(text: str) -> str:
+    s = strip_code_fences(text)
+    s = extract_json_region(s)
+    s = remove_trailing_commas(s)
+    s = balance_brackets(s)
+    s = remove_trailing_commas(s)
+    return s.strip()
+
+def main():
+    print(f"{'payload':<28}{'bytes':>10}{'legacy us':>14}{'single-pass us':>16}{'speedup':>10}")
+    for size, name, text in corpus.payloads():
+        number = {"small": 2000, "medium": 200, "large": 5}[size]
+        t_old = min(timeit.repeat(lambda: legacy_repair(text), number=number, repeat=3)) / number * 1e6
+        t_new = min(timeit.repeat(lambda: repair_json_structure(text), number=number, repeat=3)) / number * 1e6
+        print(f"{size + '/' + name:<28}{len(text):>10}{t_old:>14.1f}{t_new:>16.1f}{t_old / t_new:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Retry and JSON-mode fallback scenarios against the local fake server.
+
+Each scenario injects faults and reports how many HTTP requests reached the
+server and how long the call took (requires the openai package). Run with:
+    python -m benchmarks.bench_retry
+"""
+import time
+from ai_client.providers.provider_openai import OpenAIProvider
+from ai_client.retry import RetryPolicy
+from .fake_openai_server import FakeOpenAIServer
+
+SCENARIOS = [
+    ("clean", [], True),
+    ("429 then ok", ["429"], True),
+    ("500, 503 then ok", ["500", "503"], True),
+    ("json mode unsupported (first call)", [], False),
+    ("json mode unsupported (remembered)", [], False),
+]
+
+def main():
+    policy = RetryPolicy(max_attempts=4, base_delay=0.05, max_delay=0.5)
+    with FakeOpenAIServer() as server:
+        provider = OpenAIProvider(api_key="sk-bench", base_url=server.base_url, retry=policy)
+        print(f"{'scenario':<38}{'http requests':>15}{'ms':>10}")
+        for name, faults, json_mode in SCENARIOS:
+            server.json_mode = json_mode
+            server.inject(*faults)
+            before = server.requests
+            t0 = time.perf_counter()
+            provider.generate("", name, "fake-model" if json_mode else "fake-model-no-json", 0.2, 800)
+            ms = (time.perf_counter() - t0) * 1000
+            print(f"{name:<38}{server.requests - before:>15}{ms:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Tail latency: one simulated backend vs RouterProvider over several, with and without hedging.
+
+Run with: python -m benchmarks.bench_router [--requests 400] [--concurrency 8]
+"""
+import argparse, time
+from ai_client.ai_request import AIRequest
+from ai_client.client import AIClient
+from ai_client.providers.provider_mock import MockProvider, MockProfile
+from ai_client.providers.provider_router import Backend, RouterProvider
+
+def backends(seed: int):
+    # A fast backend with a heavy tail, a slower steady one and a fast flaky one.
+    return [
+        Backend(MockProvider(profile=MockProfile(latency="lognormal", latency_ms=40, latency_sigma=1.0, seed=seed)), name="fast-tail"),
+        Backend(MockProvider(profile=MockProfile(latency="uniform", latency_ms=80, seed=seed + 1)), name="steady"),
+        Backend(MockProvider(profile=MockProfile(latency="lognormal", latency_ms=30, latency_sigma=0.5, truncated_rate=0.2, rate_limit_rate=0.05, retry_after_s=0.2, seed=seed + 2)), name="flaky"),
+    ]
+
+def run(provider, n: int, concurrency: int):
+    client = AIClient(provider, model="mock-1")
+    reqs = (AIRequest(model="mock-1", system=None, user=f"router bench {i}") for i in range(n))
+    t0 = time.perf_counter()
+    latencies, failures = [], 0
+    for r in client.generate_many(reqs, max_concurrency=concurrency):
+        if r.ok:
+            latencies.append(r.response.latency_ms)
+        else:
+            failures += 1
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0
+    return time.perf_counter() - t0, failures, pick(0.5), pick(0.95), pick(0.99)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=400)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    setups = [
+        ("fast-tail only", backends(args.seed)[0].provider),
+        ("router", RouterProvider(backends(args.seed), hedge=False)),
+        ("router + hedging", RouterProvider(backends(args.seed), hedge=True)),
+    ]
+    print(f"{'setup':<20}{'wall s':>8}{'failed':>8}{'p50 ms':>8}{'p95 ms':>8}{'p99 ms':>8}")
+    routers = []
+    for name, provider in setups:
+        wall, failed, p50, p95, p99 = run(provider, args.requests, args.concurrency)
+        print(f"{name:<20}{wall:>8.1f}{failed:>8}{p50:>8}{p95:>8}{p99:>8}")
+        if isinstance(provider, RouterProvider):
+            routers.append((name, provider))
+    for name, router in routers:
+        print(f"\n{name}:")
+        for s in router.stats():
+            print(f"  {s['name']:<10} calls {s['calls']:>4}  errors {s['errors']:>3}  invalid {s['invalid']:>3}  p95 {s['p95_ms'] or 0:>6.0f} ms  hedges {s['hedges']:>3} (won {s['hedge_wins']})")
+        router.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Offline load test: AIClient.generate_many against a simulated MockProvider.
+
+Run with: python -m benchmarks.bench_soak [--requests 2000] [--concurrency 32]
+          [--latency lognormal --latency-ms 800] [--truncated-rate 0.05] [--rate-limit-rate 0.02]
+"""
+import argparse, os, time
+from ai_client import _json, metrics
+
+def _percentile(values, q: float) -> float:
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--latency", default="lognormal", choices=("fixed", "uniform", "exponential", "lognormal"))
+    ap.add_argument("--latency-ms", type=float, default=800.0)
+    ap.add_argument("--latency-sigma", type=float, default=0.5)
+    for fault in ("fenced", "prose", "truncated", "trailing-comma", "rate-limit"):
+        ap.add_argument(f"--{fault}-rate", type=float, default=0.0)
+    ap.add_argument("--retry-after-s", type=float, default=0.5)
+    ap.add_argument("--max-tokens", type=int, default=800)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    # The provider registry builds MockProvider from MOCK_PROFILE on first use.
+    os.environ["MOCK_PROFILE"] = _json.dumps({
+        "latency": args.latency, "latency_ms": args.latency_ms, "latency_sigma": args.latency_sigma,
+        "fenced_rate": args.fenced_rate, "prose_rate": args.prose_rate, "truncated_rate": args.truncated_rate,
+        "trailing_comma_rate": args.trailing_comma_rate, "rate_limit_rate": args.rate_limit_rate,
+        "retry_after_s": args.retry_after_s, "seed": args.seed,
+    })
+    from ai_client.ai_request import AIRequest
+    from ai_client.client import AIClient
+    from ai_client.providers.registry import get_provider
+    client = AIClient("mock", "mock-1")
+    requests = (AIRequest(model="mock-1", system=None, user=f"soak {i}", max_tokens=args.max_tokens) for i in range(args.requests))
+    t0 = time.perf_counter()
+    latencies, errors, tokens_in, tokens_out = [], {}, 0, 0
+    for r in client.generate_many(requests, max_concurrency=args.concurrency):
+        if r.ok:
+            latencies.append(r.response.latency_ms)
+            tokens_in += r.response.tokens_in
+            tokens_out += r.response.tokens_out
+        else:
+            kind = type(r.error).__name__ if not isinstance(r.error, ValueError) else str(r.error).split(":")[0]
+            errors[kind] = errors.get(kind, 0) + 1
+    wall = time.perf_counter() - t0
+    latencies.sort()
+    print(f"{args.requests} requests, concurrency {args.concurrency}: {wall:.1f}s, {args.requests / wall:.1f} req/s")
+    print(f"ok {len(latencies)}  latency ms p50 {_percentile(latencies, 0.5):.0f}  p95 {_percentile(latencies, 0.95):.0f}  p99 {_percentile(latencies, 0.99):.0f}")
+    print(f"tokens in {tokens_in}  out {tokens_out}")
+    print("errors", _json.dumps(errors))
+    print("provider", _json.dumps(get_provider("mock").stats()))
+    print("counters", _json.dumps(metrics.default().memory().summary()["counters"]))
+
+if __name__ == "__main__":
+    main()
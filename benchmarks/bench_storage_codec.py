@@ -0,0 +1,51 @@
+"""Recipe storage codecs: on-disk size vs read/decode cost.
+
+Run with: python -m benchmarks.bench_storage_codec [--rows 20000]
+"""
+import argparse, json, os, tempfile, time
+from ai_client.recipe_codec import CODECS, ZSTD, encode_recipe, decode_recipe
+from ai_client.storage import SQLiteRecipeStore
+from .corpus import recipes
+
+def _available(codec: str) -> bool:
+    try:
+        encode_recipe({}, codec)
+        return True
+    except RuntimeError:
+        return False
+
+def _seconds(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=20000)
+    args = ap.parse_args()
+    n = args.rows
+    sample = list(recipes(200))
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for codec in CODECS:
+            if not _available(codec):
+                print(f"skipping {codec}: 'zstandard' not installed" if codec == ZSTD else f"skipping {codec}")
+                continue
+            encoded = [encode_recipe(r, codec) for r in sample]
+            row_bytes = sum(len(e.encode("utf-8") if isinstance(e, str) else e) for e in encoded) / len(encoded)
+            decode_us = _seconds(lambda: [decode_recipe(e) for e in encoded * 10]) / (len(encoded) * 10) * 1e6
+            path = os.path.join(tmp, f"{codec}.db")
+            store = SQLiteRecipeStore(path, codec=codec)
+            ingest = _seconds(lambda: store.save_many(recipes(n)))
+            with store._connect() as con:
+                con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                ids = [r[0] for r in con.execute("SELECT id FROM recipes")]
+            read = _seconds(lambda: [json.loads(store.get(i)["json"]) for i in ids])
+            store.close()
+            results.append((codec, row_bytes, os.path.getsize(path) / 1e6, decode_us, n / ingest, n / read))
+    print(f"{'codec':<8}{'bytes/row':>11}{'db MB':>9}{'decode us':>11}{'ingest/s':>11}{'get+load/s':>12}")
+    for codec, row_bytes, mb, decode_us, ingest, read in results:
+        print(f"{codec:<8}{row_bytes:>11.0f}{mb:>9.1f}{decode_us:>11.1f}{ingest:>11.0f}{read:>12.0f}")
+
+if __name__ == "__main__":
+    main()
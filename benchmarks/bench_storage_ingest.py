@@ -0,0 +1,35 @@
+"""Ingest throughput: SQLiteRecipeStore.save (one transaction per row) vs save_many.
+
+Run with: python -m benchmarks.bench_storage_ingest [--rows 20000]
+"""
+import argparse, os, tempfile, time
+from ai_client.storage import SQLiteRecipeStore
+from .corpus import recipes
+
+def _rate(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return n / (time.perf_counter() - t0)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=20000)
+    ap.add_argument("--batch-size", type=int, default=500)
+    args = ap.parse_args()
+    n = args.rows
+    with tempfile.TemporaryDirectory() as tmp:
+        single = SQLiteRecipeStore(os.path.join(tmp, "single.db"))
+        bulk = SQLiteRecipeStore(os.path.join(tmp, "bulk.db"))
+        results = [
+            ("save() per row", _rate(lambda: [single.save(r) for r in recipes(n)], n)),
+            ("save_many()", _rate(lambda: bulk.save_many(recipes(n), batch_size=args.batch_size), n)),
+            ("save_many(upsert) re-ingest", _rate(lambda: bulk.save_many(recipes(n), batch_size=args.batch_size, upsert=True), n)),
+        ]
+        single.close()
+        bulk.close()
+    print(f"{'path':<32}{'rows/sec':>12}")
+    for name, rate in results:
+        print(f"{name:<32}{rate:>12.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Deterministic benchmark corpus: recipes and the model-output shapes repair sees.
+
+Everything is derived from (index, seed), so two runs of the suite measure the same
+inputs.
+"""
+import json, random
+from typing import Dict, Iterator, Tuple
+
+# (ingredients, steps) per size.
+SIZES: Dict[str, Tuple[int, int]] = {"small": (5, 4), "medium": (25, 15), "large": (2000, 1000)}
+VARIANTS = ("valid", "fenced", "trailing-comma", "truncated")
+
+INGREDIENTS = (
+    "flour", "sugar", "butter", "egg", "milk", "salt", "garlic", "onion", "tomato", "basil",
+    "olive oil", "chicken", "rice", "lemon", "ginger", "soy sauce", "pepper", "carrot", "potato", "cheese",
+    "spinach", "mushroom", "cream", "beef", "pasta", "chili", "cumin", "yogurt", "honey", "vinegar",
+)
+DISHES = ("Soup", "Stew", "Pasta", "Curry", "Salad", "Pie", "Bread", "Risotto", "Tacos", "Stir Fry")
+EQUIPMENT = ("Pan", "Pot", "Bowl", "Oven", "Whisk", "Knife", "Blender")
+UNITS = ("g", "cup", "tbsp", "tsp", None)
+
+def recipe(i: int, size: str = "small", seed: int = 0) -> dict:
+    rnd = random.Random(f"{seed}:{size}:{i}")
+    n_ing, n_steps = SIZES[size]
+    names = [rnd.choice(INGREDIENTS) for _ in range(n_ing)]
+    prep, cook = rnd.randint(5, 30), rnd.randint(5, 90)
+    return {
+        "title": f"{names[0].title()} {rnd.choice(DISHES)} {i}",
+        "servings": rnd.randint(1, 8),
+        "difficulty": rnd.choice(("easy", "medium", "hard")),
+        "time": {"prep_min": prep, "cook_min": cook, "total_min": prep + cook},
+        "ingredients": [{"name": n, "quantity": float(rnd.randint(1, 4)), "unit": rnd.choice(UNITS), "notes": None} for n in names],
+        "steps": [
+            {"number": s + 1, "instruction": f"Add the {rnd.choice(names)} and stir for {rnd.randint(1, 9)} minutes.", "duration_min": rnd.randint(1, 15),
+             "equipment": [{"name": rnd.choice(EQUIPMENT), "usage": None}], "notes": None}
+            for s in range(n_steps)
+        ],
+    }
+
+def recipes(n: int, size: str = "small", seed: int = 0) -> Iterator[dict]:
+    for i in range(n):
+        yield recipe(i, size, seed)
+
+def render(obj: dict, variant: str) -> str:
+    # Model output as repair_json_structure would receive it.
+    text = json.dumps(obj, indent=2)
+    if variant == "valid":
+        return text
+    if variant == "fenced":
+        return "Here is your recipe:\n```json\n" + text + "\n```\nEnjoy!"
+    if variant == "trailing-comma":
+        return text.replace("}", ",}").replace("]", ",]")
+    if variant == "truncated":
+        return text[: int(len(text) * 0.8)]
+    raise ValueError(f"unknown variant: {variant}")
+
+def payloads(seed: int = 0) -> Iterator[Tuple[str, str, str]]:
+    # (size, variant, text) for every size and variant.
+    for size in SIZES:
+        obj = recipe(0, size, seed)
+        for variant in VARIANTS:
+            yield size, variant, render(obj, variant)
@@ -0,0 +1,105 @@
+"""Minimal local stand-in for the OpenAI chat completions endpoint.
+
+Serves mock recipes over HTTP/1.1 keep-alive so provider-level behaviour
+(connection reuse, retries) can be measured without network access. Faults
+can be scripted per request with inject(): "429", "500", "503" and
+"unsupported" (a 400 rejecting response_format). Setting json_mode=False
+makes every request that sends response_format fail as "unsupported".
+"""
+import json, threading, time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ai_client.providers.provider_mock import MockProvider
+
+def _error(message: str, kind: str, param=None) -> dict:
+    return {"error": {"message": message, "type": kind, "param": param, "code": None}}
+
+class FakeOpenAIServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_s: float = 0.0, json_mode: bool = True, retry_after_s: float = 0.05):
+        self.latency_s = latency_s
+        self.json_mode = json_mode
+        self.retry_after_s = retry_after_s
+        self.requests = 0
+        self.faults_served = 0
+        self.__faults = deque()
+        self.__faults_lock = threading.Lock()
+        self.__mock = MockProvider()
+        self.__httpd = ThreadingHTTPServer((host, port), self.__handler())
+        self.__httpd.daemon_threads = True
+        self.__thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.__httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self):
+        self.__thread = threading.Thread(target=self.__httpd.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.__httpd.shutdown()
+        self.__httpd.server_close()
+
+    def inject(self, *faults: str):
+        with self.__faults_lock:
+            self.__faults.extend(faults)
+
+    def __next_fault(self, body: dict):
+        with self.__faults_lock:
+            fault = self.__faults.popleft() if self.__faults else None
+        if fault is None and not self.json_mode and "response_format" in body:
+            fault = "unsupported"
+        return fault
+
+    def respond(self, body: dict):
+        # Returns (status, headers, payload) for one chat completion request.
+        fault = self.__next_fault(body)
+        if fault is not None:
+            self.faults_served += 1
+            if fault == "429":
+                return 429, {"retry-after": str(self.retry_after_s)}, _error("Rate limit reached", "rate_limit_exceeded")
+            if fault == "unsupported":
+                return 400, {}, _error("Invalid parameter: 'response_format' of type 'json_object' is not supported with this model.", "invalid_request_error", param="response_format")
+            return int(fault), {}, _error("The server had an error while processing your request.", "server_error")
+        msgs = body.get("messages") or []
+        system = next((m["content"] for m in msgs if m.get("role") == "system"), "")
+        user = next((m["content"] for m in msgs if m.get("role") == "user"), "")
+        text, _, _, tokens_out = self.__mock.generate(system, user, body.get("model", ""), None, None)
+        payload = {
+            "id": f"chatcmpl-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", ""),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+            "usage": {"prompt_tokens": 200, "completion_tokens": tokens_out, "total_tokens": 200 + tokens_out},
+        }
+        return 200, {}, payload
+
+    def __handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                server.requests += 1
+                if server.latency_s:
+                    time.sleep(server.latency_s)
+                status, headers, payload = server.respond(body)
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
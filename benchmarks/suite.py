@@ -0,0 +1,184 @@
+"""Benchmark suite for the client, repair, validation and storage hot paths.
+
+Run with: python -m benchmarks.suite [--rows 10000,100000] [--latency-ms 20] [--out results.json]
+Compare:  python -m benchmarks.suite --baseline baseline.json [--threshold 0.10]
+          python -m benchmarks.suite --compare baseline.json results.json
+
+Every result is microseconds per operation (lower is better): the median of several
+samples, each run for at least --min-time seconds. --baseline runs the suite and then
+compares; either comparison exits 1 when a case slowed down by more than --threshold.
+"""
+import argparse, datetime, json, os, platform, random, sqlite3, statistics, subprocess, sys, tempfile, time
+from typing import Callable, Dict, List, Optional
+from . import corpus
+
+SUITES = ("repair", "validate", "client", "storage")
+
+def measure(fn: Callable[[], object], min_time: float, samples: int) -> Dict[str, object]:
+    # Calibrate a loop count that runs for min_time, then take samples of it.
+    n = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_time or n >= 1 << 20:
+            break
+        n = max(n * 2, int(n * min_time / max(elapsed, 1e-9)))
+    times = [elapsed / n * 1e6]
+    for _ in range(samples - 1):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        times.append((time.perf_counter() - t0) / n * 1e6)
+    return {"us_per_op": statistics.median(times), "min_us": min(times), "loops": n, "samples": len(times)}
+
+def bench_repair(args) -> Dict[str, dict]:
+    from ai_client.json_repair import repair_json_structure
+    out = {}
+    for size, variant, text in corpus.payloads(args.seed):
+        out[f"repair/{size}/{variant}"] = measure(lambda: repair_json_structure(text), args.min_time, args.samples)
+    return out
+
+def bench_validate(args) -> Dict[str, dict]:
+    from ai_client.validation import is_valid_recipe, validate_recipe
+    out = {}
+    for size in corpus.SIZES:
+        obj = corpus.recipe(0, size, args.seed)
+        assert not validate_recipe(obj)
+        out[f"validate/{size}"] = measure(lambda: validate_recipe(obj), args.min_time, args.samples)
+        out[f"validate/{size}/is_valid"] = measure(lambda: is_valid_recipe(obj), args.min_time, args.samples)
+    return out
+
+def bench_client(args) -> Dict[str, dict]:
+    # MockProvider reads MOCK_LATENCY_MS when the registry first builds it.
+    os.environ["MOCK_LATENCY_MS"] = str(args.latency_ms)
+    from ai_client.ai_request import AIRequest
+    from ai_client.cache import MemoryCache
+    from ai_client.client import AIClient
+    client = AIClient("mock", "mock-1")
+    cached = AIClient("mock", "mock-1", cache=MemoryCache())
+    counter = iter(range(1 << 62))
+    req = lambda: AIRequest(model="mock-1", system=None, user=f"bench {next(counter)}")
+    hit = AIRequest(model="mock-1", system=None, user="bench cached")
+    cached.generate(hit)
+    batch = [AIRequest(model="mock-1", system=None, user=f"batch {i}") for i in range(64)]
+    tag = f"latency={args.latency_ms:g}ms"
+    return {
+        f"client/generate[{tag}]": measure(lambda: client.generate(req()), args.min_time, args.samples),
+        "client/generate_cache_hit": measure(lambda: cached.generate(hit), args.min_time, args.samples),
+        f"client/generate_many_per_req[{tag},c=16]": _per_item(measure(lambda: list(client.generate_many(batch, max_concurrency=16)), args.min_time, args.samples), len(batch)),
+    }
+
+def _per_item(result: dict, n: int) -> dict:
+    return dict(result, us_per_op=result["us_per_op"] / n, min_us=result["min_us"] / n)
+
+def bench_storage(args) -> Dict[str, dict]:
+    from ai_client.storage import SQLiteRecipeStore, SUMMARY_FIELDS, encode_cursor
+    out = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            store = SQLiteRecipeStore(os.path.join(tmp, f"bench_{rows}.db"))
+            t0 = time.perf_counter()
+            ids = store.save_many(corpus.recipes(rows, "small", args.seed))
+            ingest = (time.perf_counter() - t0) / rows * 1e6
+            out[f"storage[{rows}]/save_many_per_row"] = {"us_per_op": ingest, "min_us": ingest, "loops": rows, "samples": 1}
+            rnd = random.Random(args.seed)
+            extra = corpus.recipes(1 << 30, "small", args.seed + 1)
+            deep = encode_cursor(store.list(limit=1, offset=rows // 2)[0])
+            cases = {
+                "save": lambda: store.save(next(extra)),
+                "get": lambda: store.get(rnd.choice(ids)),
+                "list_first_page": lambda: store.list(limit=50, fields=SUMMARY_FIELDS),
+                "list_deep_cursor": lambda: store.list(limit=50, after=deep, fields=SUMMARY_FIELDS),
+                "search": lambda: store.search(rnd.choice(corpus.INGREDIENTS), limit=20, fields=SUMMARY_FIELDS),
+                "search_recent": lambda: store.search(rnd.choice(corpus.INGREDIENTS), limit=20, order="recent", fields=SUMMARY_FIELDS),
+                "find_by_ingredient": lambda: store.find_by_ingredient(rnd.choice(corpus.INGREDIENTS), limit=20, fields=SUMMARY_FIELDS),
+            }
+            for name, fn in cases.items():
+                out[f"storage[{rows}]/{name}"] = measure(fn, args.min_time, args.samples)
+            store.close()
+    return out
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment() -> Dict[str, object]:
+    from ai_client import _json
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "git": _git_rev(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "sqlite": sqlite3.sqlite_version,
+        "json_backend": _json.BACKEND,
+    }
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    # Prints a table of shared cases; returns the names that regressed.
+    old, new = baseline["results"], current["results"]
+    regressions = []
+    print(f"{'case':<56}{'baseline us':>13}{'current us':>13}{'change':>9}")
+    for name in sorted(set(old) & set(new)):
+        a, b = old[name]["us_per_op"], new[name]["us_per_op"]
+        change = (b - a) / a if a else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif change < -threshold:
+            flag = "  faster"
+        print(f"{name:<56}{a:>13.2f}{b:>13.2f}{change:>+9.1%}{flag}")
+    for name in sorted(set(old) ^ set(new)):
+        print(f"{name:<56}  only in {'baseline' if name in old else 'current'}")
+    return regressions
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--only", default=",".join(SUITES), help="comma-separated subset of " + ",".join(SUITES))
+    ap.add_argument("--rows", default="10000", help="comma-separated store sizes, e.g. 10000,100000,1000000")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="latency injected into MockProvider")
+    ap.add_argument("--min-time", type=float, default=0.2, help="seconds per sample")
+    ap.add_argument("--samples", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="write results JSON here (default: stdout)")
+    ap.add_argument("--baseline", help="compare the run against this results JSON")
+    ap.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="compare two results files without running")
+    ap.add_argument("--threshold", type=float, default=0.10, help="relative slowdown reported as a regression")
+    args = ap.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f, open(args.compare[1]) as g:
+            sys.exit(1 if compare(json.load(f), json.load(g), args.threshold) else 0)
+
+    args.rows = [int(r) for r in args.rows.split(",") if r]
+    only = [s for s in args.only.split(",") if s]
+    unknown = set(only) - set(SUITES)
+    if unknown:
+        ap.error("unknown suite: " + ", ".join(sorted(unknown)))
+    runners = {"repair": bench_repair, "validate": bench_validate, "client": bench_client, "storage": bench_storage}
+    results: Dict[str, dict] = {}
+    for name in only:
+        print(f"running {name} ...", file=sys.stderr, flush=True)
+        results.update(runners[name](args))
+    report = {
+        "environment": environment(),
+        "config": {"rows": args.rows, "latency_ms": args.latency_ms, "min_time": args.min_time, "samples": args.samples, "seed": args.seed},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline) as f:
+            sys.exit(1 if compare(json.load(f), report, args.threshold) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,11 @@
 import os, json, tkinter as tk
 from tkinter import ttk, messagebox
 from ai_client.client import AIClient
+from ai_client.cache import MemoryCache
 from ai_client.ai_request import AIRequest
 from ai_client.recipe_schema import schema_description
-from ai_client.supported_models import get_supported_models
-from ai_client.storage import get_store
+from ai_client.supported_models import get_supported_models, get_supported_providers
+from ai_client.storage import get_store, SUMMARY_FIELDS
 
 class App:
     def __init__(self, root):
@@ -14,6 +15,8 @@ class App:
         self.__provider_var = tk.StringVar(value="mock")
         self.__model_var = tk.StringVar(value="mock-1")
         self.__prompt_var = tk.StringVar(value="Generate a spiced gram flour snack recipe")
+        self.__cache = MemoryCache()
+        self.__clients = {}
         self.__build_ui()
         self.__refresh_models()
 
@@ -32,7 +35,7 @@ class App:
 
         row = 0
         ttk.Label(frm, text="Provider:").grid(row=row, column=0, sticky="w")
-        self.__provider_cb = ttk.Combobox(frm, textvariable=self.__provider_var, values=["mock","openai"], state="readonly", width=10)
+        self.__provider_cb = ttk.Combobox(frm, textvariable=self.__provider_var, values=get_supported_providers(), state="readonly", width=10)
         self.__provider_cb.grid(row=row, column=1, sticky="w")
         self.__provider_cb.bind("<<ComboboxSelected>>", self.__on_provider_selected)
 
@@ -103,9 +106,9 @@ class App:
             messagebox.showerror("Error", "Prompt cannot be empty")
             return
         try:
-            client = AIClient(provider=provider, model=model)
+            client = self.__get_client(provider, model)
             system = "Return ONLY valid JSON matching the provided schema. No prose. Use the exact keys from schema."
-            req = AIRequest(model=model, system=system, user=prompt, temperature=0.2, max_tokens=800)
+            req = AIRequest(model=model, system=system, user=prompt, temperature=0.2)
             res = client.generate(req)
             parsed = json.loads(res.text)
             self.__output.delete("1.0", "end")
@@ -114,6 +117,12 @@ class App:
             self.__output.delete("1.0", "end")
             self.__output.insert("1.0", f"Error: {e}")
 
+    def __get_client(self, provider, model):
+        key = (provider, model)
+        if key not in self.__clients:
+            self.__clients[key] = AIClient(provider=provider, model=model, cache=self.__cache)
+        return self.__clients[key]
+
     def __on_save(self):
         try:
             text = self.__output.get("1.0", "end").strip()
@@ -134,7 +143,7 @@ class App:
     def __on_browse(self):
         store = get_store()
         try:
-            rows = store.list(limit=200)
+            rows = store.list(limit=200, fields=SUMMARY_FIELDS)
         except Exception as e:
             messagebox.showerror("DB Error", f"Failed to list recipes:\n{e}")
             return
@@ -157,13 +166,13 @@ class App:
             for i in tree.get_children():
                 tree.delete(i)
             for r in items:
-                tree.insert("", "end", values=(r.get("id"), r.get("title"), r.get("created_at")))
+                tree.insert("", "end", values=(r.id, r.title, r.created_at))
         refresh(rows)
 
         def do_search(*args):
             q = search_var.get().strip()
             try:
-                items = store.search(q, limit=200) if q else store.list(limit=200)
+                items = store.search(q, limit=200, fields=SUMMARY_FIELDS) if q else store.list(limit=200, fields=SUMMARY_FIELDS)
                 refresh(items)
             except Exception as e:
                 messagebox.showerror("DB Error", f"Search failed:\n{e}")